@@ -1,96 +1,204 @@
 from langchain.agents import AgentExecutor, create_openai_tools_agent
+from langchain.agents.format_scratchpad.openai_tools import format_to_openai_tool_messages
+from langchain.agents.output_parsers.openai_tools import OpenAIToolsAgentOutputParser
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_openai import ChatOpenAI
+from langchain_core.runnables import RunnablePassthrough
 from langchain.tools import StructuredTool
 from datetime import date
+import httpx
 import os
+import re
+import time
+
+from agent.hedging import LLM_HEDGE_MODEL, hedged_model
+from agent.llm_client import build_llm, shared_http_client
+from agent.plan_cache import plan_schema_version
+from api.observability import metrics_callback
+from api.store import get_store, run_blocking
 
 from api.tools import (
-    get_leave_balance, LeaveBalanceInput,
-    apply_for_leave, ApplyLeaveInput,
-    check_leave_status, CheckStatusInput,
-    get_all_pending_requests, GetAllPendingRequestsInput,
-    manage_leave_request, ManageLeaveRequestInput,
+    get_leave_balance, aget_leave_balance, LeaveBalanceInput,
+    apply_for_leave, aapply_for_leave, ApplyLeaveInput,
+    check_leave_status, acheck_leave_status, CheckStatusInput,
+    get_all_pending_requests, aget_all_pending_requests, GetAllPendingRequestsInput,
+    manage_leave_request, amanage_leave_request, ManageLeaveRequestInput,
+    manage_leave_requests_bulk, amanage_leave_requests_bulk, ManageLeaveRequestsBulkInput,
+    get_team_calendar, aget_team_calendar, GetTeamCalendarInput,
 )
- 
-def setup_agent():
-    llm = ChatOpenAI(
-        model=os.environ.get("OPENROUTER_MODEL"),
-        openai_api_base=os.environ.get("OPENROUTER_API_BASE", "https://openrouter.ai/api/v1"),
-        openai_api_key=os.environ.get("OPENROUTER_API_KEY"),
-        temperature=0.0,
-        streaming=False,
-    )
-    print(os.environ.get("OPENROUTER_MODEL"))
+
+
+# Manager-only tools are left out of the employee agent entirely: employees no longer
+# send their schemas on every call, and the model cannot pick one just to be refused.
+EMPLOYEE_TOOL_NAMES = {"get_leave_balance", "apply_for_leave", "check_leave_status", "get_team_calendar"}
+
+# Chain-level stdout logging is a debugging aid with a real per-request cost; opt in with AGENT_VERBOSE=1.
+AGENT_VERBOSE = os.environ.get("AGENT_VERBOSE") == "1"
+
+
+def build_tools():
     tools = [
         StructuredTool.from_function(
-            name="get_leave_balance", func=get_leave_balance,
+            name="get_leave_balance", func=get_leave_balance, coroutine=aget_leave_balance,
             description="Fetch available leave balances (casual, sick, earned) for a user.",
             args_schema=LeaveBalanceInput,
             return_direct=True
         ),
 
         StructuredTool.from_function(
-            name="apply_for_leave", func=apply_for_leave,
+            name="apply_for_leave", func=apply_for_leave, coroutine=aapply_for_leave,
             description="Apply for a leave by specifying user ID, leave type, days, start date, and reason.",
             args_schema=ApplyLeaveInput,
             return_direct=True
         ),
 
         StructuredTool.from_function(
-            name="check_leave_status", func=check_leave_status,
-            description="Check the leave request history and status for a user.",
+            name="check_leave_status", func=check_leave_status, coroutine=acheck_leave_status,
+            description="Check the leave request history and status for a user. Returns one page; pass `next_cursor` back as `cursor` for more. Decided requests from past years are archived and only included with `include_archived` or a `start_from` reaching back to them.",
             args_schema=CheckStatusInput,
             return_direct=True
         ),
+
+        StructuredTool.from_function(
+            name="get_team_calendar", func=get_team_calendar, coroutine=aget_team_calendar,
+            description="Show who is on leave (pending or approved) between two dates. Employees see their own team; managers may pick a team or see everyone.",
+            args_schema=GetTeamCalendarInput,
+            return_direct=True
+        ),
         
         # Manager Tools
         StructuredTool.from_function(
-            name="get_all_pending_requests", func=get_all_pending_requests,
-            description="FOR MANAGERS ONLY. Fetch all leave requests that are currently pending approval.",
+            name="get_all_pending_requests", func=get_all_pending_requests, coroutine=aget_all_pending_requests,
+            description="FOR MANAGERS ONLY. Fetch leave requests that are currently pending approval. Returns one page; pass `next_cursor` back as `cursor` for more.",
             args_schema=GetAllPendingRequestsInput,
             return_direct=True
         ),
 
         StructuredTool.from_function(
-            name="manage_leave_request", func=manage_leave_request,
+            name="manage_leave_request", func=manage_leave_request, coroutine=amanage_leave_request,
             description="FOR MANAGERS ONLY. Approve or reject a specific leave request by its ID.",
             args_schema=ManageLeaveRequestInput,
             return_direct=True
         ),
+
+        StructuredTool.from_function(
+            name="manage_leave_requests_bulk", func=manage_leave_requests_bulk, coroutine=amanage_leave_requests_bulk,
+            description="FOR MANAGERS ONLY. Approve or reject many leave requests at once, either as a list of (request_id, action) pairs or every pending request matching a filter (leave type, start date range, team, user IDs).",
+            args_schema=ManageLeaveRequestsBulkInput,
+            return_direct=True
+        ),
     ]
+    for tool in tools:
+        tool.callbacks = [metrics_callback]
+    return tools
+
+
+PROMPT_PATH = os.environ.get("LEAVE_PROMPT_PATH") or os.path.join(os.path.dirname(__file__), '..', 'data', 'prompt.txt')
+
+
+def load_system_prompts(path=PROMPT_PATH):
+    """Per-role system prompt templates from ``prompt.txt``.
 
-    today = date.today().isoformat()
+    Text before the first ``[role]`` line is shared; each ``[role]`` section is
+    appended to it for that role. ``{today}`` is left in for the prompt to fill.
+    """
+    with open(path, 'r') as f:
+        parts = re.split(r"^\[(\w+)\]\n", f.read(), flags=re.MULTILINE)
+    header, sections = parts[0], parts[1:]
+    return {role: header + body for role, body in zip(sections[::2], sections[1::2])}
 
+
+def _today():
+    return date.today().isoformat()
+
+
+def _hedged_agent(llm, hedge_llm, tools, prompt):
+    # create_openai_tools_agent, with the model step swapped for a hedged pair.
+    model = hedged_model(llm.bind_tools(tools), hedge_llm.bind_tools(tools), llm.model_name, hedge_llm.model_name)
+    return (
+        RunnablePassthrough.assign(
+            agent_scratchpad=lambda x: format_to_openai_tool_messages(x["intermediate_steps"]),
+        )
+        | prompt
+        | model
+        | OpenAIToolsAgentOutputParser()
+    )
+
+
+def _build_executor(llm, tools, system_prompt, role, hedge_llm=None):
+    # Compiled once; the date is a callable partial, so it is filled in on every call
+    # and rolls over at midnight without rebuilding the agent.
     prompt = ChatPromptTemplate.from_messages([
-        ("system", f"""
-            You are a highly capable leave management assistant. Today is {today}.
-            You MUST use the provided tools to answer the user's query and ALWAYS return the direct output of the tool.
-
-            **CRITICAL RULES:**
-            1. You will be given a `user_id`, the user's `role` ('employee' or 'manager'), and a `query`.
-            2. You MUST respect the user's role. Employee tools are for everyone. Manager tools are ONLY for users with the 'manager' role.
-            3. If a non-manager tries to use a manager tool, you must refuse and explain why. However, the tools have built-in checks, so you should prefer calling the tool and letting it return the access error.
-            4. Parse the user's query to determine the correct tool and its parameters.
-            5. IMPORTANT **For managers**, when they want to see pending requests, use `get_all_pending_requests`. When they want to approve or reject, you MUST extract the `request_id` and the `action` ('approved' or 'rejected') from the query and use the `manage_leave_request` tool. The manager's own `user_id` must be passed as `manager_id`.
-
-            **Example Manager Query:**
-            - "Approve request req_123456" -> Call `manage_leave_request` with `manager_id`=<manager's_id>, `request_id`='req_123456', `action`='approved'.
-            - "Show me who needs leave approval" -> Call `get_all_pending_requests` with `manager_id`=<manager's_id>.
-        """),
+        ("system", system_prompt),
         ("human", "User ID: {user_id}\nUser Role: {role}\nQuery: {query}"),
         MessagesPlaceholder(variable_name="agent_scratchpad")
-    ])
+    ]).partial(today=_today)
 
-    agent = create_openai_tools_agent(llm=llm, tools=tools, prompt=prompt)
+    if hedge_llm is not None:
+        agent = _hedged_agent(llm, hedge_llm, tools, prompt)
+    else:
+        agent = create_openai_tools_agent(llm=llm, tools=tools, prompt=prompt)
 
     agent_executor = AgentExecutor(
         agent=agent,
         tools=tools,
-        verbose=True,
-        handle_parsing_errors=True
+        verbose=AGENT_VERBOSE,
+        handle_parsing_errors=True,
+        return_intermediate_steps=True,
+        metadata={"role": role, "plan_schema_version": plan_schema_version(tools, system_prompt)},
     )
 
-    print("########### LangChain agent with role-based access initialized. ###########")
+    schema_chars = sum(len(str(t.args_schema.model_json_schema())) + len(t.description) for t in tools)
+    print(f"{role} agent: {len(tools)} tools, ~{len(system_prompt) + schema_chars} prompt chars")
     return agent_executor
 
+
+def setup_agent(tools=None):
+    """Build one executor per role; unknown roles get the employee executor.
+
+    ``tools`` defaults to the in-process tools; the MCP app passes pool-backed ones.
+    """
+    llm = build_llm()
+    hedge_llm = build_llm(LLM_HEDGE_MODEL) if LLM_HEDGE_MODEL else None
+    print(os.environ.get("OPENROUTER_MODEL"), f"(hedged with {LLM_HEDGE_MODEL})" if hedge_llm else "")
+    tools = tools or build_tools()
+    system_prompts = load_system_prompts()
+
+    agent_executors = {
+        "employee": _build_executor(
+            llm,
+            [t for t in tools if t.name in EMPLOYEE_TOOL_NAMES],
+            system_prompts["employee"],
+            "employee",
+            hedge_llm,
+        ),
+        "manager": _build_executor(
+            llm,
+            tools,
+            system_prompts["manager"],
+            "manager",
+            hedge_llm,
+        ),
+    }
+
+    print("########### LangChain agent with role-based access initialized. ###########")
+    return agent_executors
+
+
+async def warm_up() -> dict:
+    """Load the store indexes and open an upstream connection before the first request.
+
+    Returns the seconds each step took; an unreachable model API is logged, not fatal.
+    """
+    timings = {}
+    started = time.perf_counter()
+    await run_blocking(lambda: get_store().get_user(""))
+    timings["store_load"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    base_url = os.environ.get("OPENROUTER_API_BASE", "https://openrouter.ai/api/v1")
+    try:
+        await shared_http_client().get(f"{base_url}/models", timeout=5.0)
+    except httpx.HTTPError as e:
+        print(f"Warm-up could not reach the model API: {e!r}")
+    timings["llm_connect"] = time.perf_counter() - started
+    return timings
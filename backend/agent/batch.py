@@ -0,0 +1,43 @@
+"""Plan several queries from one user with a single model call.
+
+The queries are numbered into one agent turn and the model is asked for one
+parallel tool call per query. The calls come back in order, so call ``i``
+answers query ``i``; if the model does not return exactly one call per query
+the caller falls back to planning them one by one.
+"""
+from typing import Optional
+
+from langchain_core.agents import AgentFinish
+
+BATCH_INSTRUCTIONS = (
+    "Answer each of the numbered queries below. Make exactly one tool call per query, "
+    "all in this single response, in the same order as the queries."
+)
+
+
+def batch_query(queries: list) -> str:
+    numbered = "\n".join(f"{i}. {q}" for i, q in enumerate(queries, start=1))
+    return f"{BATCH_INSTRUCTIONS}\n{numbered}"
+
+
+async def plan_batch(agent_executor, user_id: str, role: str, queries: list) -> Optional[list]:
+    """Return one ``(tool_name, tool_args)`` per query, or ``None`` if the model's answer does not line up."""
+    actions = await agent_executor.agent.aplan(
+        intermediate_steps=[],
+        user_id=user_id,
+        role=role,
+        query=batch_query(queries),
+    )
+    if isinstance(actions, AgentFinish) or len(actions) != len(queries):
+        return None
+    if not all(isinstance(a.tool_input, dict) for a in actions):
+        return None
+    return [(a.tool, a.tool_input) for a in actions]
+
+
+async def plan_single(agent_executor, user_id: str, role: str, query: str):
+    """Plan one query; returns ``(tool_name, tool_args)`` or the model's text answer."""
+    actions = await agent_executor.agent.aplan(intermediate_steps=[], user_id=user_id, role=role, query=query)
+    if isinstance(actions, AgentFinish):
+        return actions.return_values.get("output")
+    return actions[0].tool, actions[0].tool_input
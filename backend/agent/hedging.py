@@ -0,0 +1,162 @@
+"""Hedged model calls: race a secondary model against a slow primary.
+
+Each planning call goes to the primary model first. If it has not answered
+within the primary's recent ``LLM_HEDGE_PERCENTILE`` latency, the same
+messages go to ``LLM_HEDGE_MODEL`` as well. The first valid answer wins and
+the other call is cancelled. A primary that fails outright falls back to the
+secondary. Only the model call is raced: the agent parses the single winning
+message and runs its tool calls once.
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+
+from api.observability import LLM_HEDGE_WINS, LLM_HEDGES
+
+LLM_HEDGE_MODEL = os.environ.get("LLM_HEDGE_MODEL") or None
+LLM_HEDGE_PERCENTILE = float(os.environ.get("LLM_HEDGE_PERCENTILE", "95"))
+LLM_HEDGE_MIN_SAMPLES = int(os.environ.get("LLM_HEDGE_MIN_SAMPLES", "20"))
+LLM_HEDGE_INITIAL_DELAY = float(os.environ.get("LLM_HEDGE_INITIAL_DELAY_MS", "2000")) / 1000
+
+
+def _is_valid(message) -> bool:
+    if not isinstance(message, AIMessage) or message.invalid_tool_calls:
+        return False
+    return bool(message.tool_calls or message.content)
+
+
+class HedgeStats:
+    """Rolling per-model latencies plus hedge and win counts."""
+
+    def __init__(self, window=500):
+        self.window = window
+        self._latencies = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.hedged = 0
+        self.fallbacks = 0
+        self.wins = {}
+        self.censored = {}
+
+    def observe(self, model, seconds, censored=False):
+        """Record a call's latency; a ``censored`` one was cancelled, so ``seconds`` is a lower bound."""
+        with self._lock:
+            self._latencies.setdefault(model, deque(maxlen=self.window)).append(seconds)
+            if censored:
+                self.censored[model] = self.censored.get(model, 0) + 1
+
+    def percentile(self, model, q):
+        with self._lock:
+            values = sorted(self._latencies.get(model, ()))
+        if not values:
+            return None
+        return values[min(len(values) - 1, int(q / 100 * len(values)))]
+
+    def hedge_delay(self, model):
+        """Seconds to wait on ``model`` before hedging; a fixed delay until enough samples exist."""
+        with self._lock:
+            samples = len(self._latencies.get(model, ()))
+        if samples < LLM_HEDGE_MIN_SAMPLES:
+            return LLM_HEDGE_INITIAL_DELAY
+        return self.percentile(model, LLM_HEDGE_PERCENTILE)
+
+    def record_win(self, model):
+        with self._lock:
+            self.wins[model] = self.wins.get(model, 0) + 1
+        LLM_HEDGE_WINS.labels(model).inc()
+
+    def as_dict(self) -> dict:
+        ms = lambda v: None if v is None else round(v * 1000, 2)
+        return {
+            "calls": self.calls,
+            "hedged": self.hedged,
+            "hedge_rate": self.hedged / self.calls if self.calls else 0.0,
+            "fallbacks": self.fallbacks,
+            "wins": dict(self.wins),
+            "censored": dict(self.censored),
+            "win_rate": {m: n / self.calls for m, n in self.wins.items()} if self.calls else {},
+            "latency_ms": {m: {f"p{q}": ms(self.percentile(m, q)) for q in (50, 95, 99)}
+                           for m in list(self._latencies)},
+        }
+
+
+hedge_stats = HedgeStats()
+
+
+async def _timed(model_name, runnable, messages, config):
+    started = time.perf_counter()
+    try:
+        message = await runnable.ainvoke(messages, config)
+    except asyncio.CancelledError:
+        # The losing call of a race is the slow one: dropping it would pull the hedge delay down.
+        hedge_stats.observe(model_name, time.perf_counter() - started, censored=True)
+        raise
+    hedge_stats.observe(model_name, time.perf_counter() - started)
+    return message
+
+
+def hedged_model(primary, secondary, primary_name, secondary_name):
+    """A runnable that takes the prompt's messages and returns the winning ``AIMessage``.
+
+    ``primary`` and ``secondary`` are chat models with the tools already bound.
+    """
+
+    async def ainvoke(messages, config):
+        hedge_stats.calls += 1
+        names = {}
+        pending = set()
+        errors = []
+        try:
+            first = asyncio.create_task(_timed(primary_name, primary, messages, config))
+            names[first] = primary_name
+            pending.add(first)
+            done, _ = await asyncio.wait(pending, timeout=hedge_stats.hedge_delay(primary_name))
+            if not done:
+                hedge_stats.hedged += 1
+                LLM_HEDGES.inc()
+                second = asyncio.create_task(_timed(secondary_name, secondary, messages, config))
+                names[second] = secondary_name
+                pending.add(second)
+
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        errors.append(task.exception())
+                    elif _is_valid(task.result()):
+                        hedge_stats.record_win(names[task])
+                        return task.result()
+                    else:
+                        errors.append(ValueError(f"{names[task]} returned no usable answer."))
+                if not pending and len(names) == 1:
+                    # The primary failed before the hedge delay: fall back to the secondary.
+                    hedge_stats.fallbacks += 1
+                    second = asyncio.create_task(_timed(secondary_name, secondary, messages, config))
+                    names[second] = secondary_name
+                    pending = {second}
+        finally:
+            for task in pending:
+                task.cancel()
+        raise errors[0]
+
+    def invoke(messages, config):
+        # Sync callers get plain fallback routing; racing needs the event loop.
+        hedge_stats.calls += 1
+        try:
+            message = primary.invoke(messages, config)
+            if _is_valid(message):
+                hedge_stats.record_win(primary_name)
+                return message
+        except Exception:
+            pass
+        hedge_stats.fallbacks += 1
+        message = secondary.invoke(messages, config)
+        hedge_stats.record_win(secondary_name)
+        return message
+
+    return RunnableLambda(invoke, afunc=ainvoke, name="HedgedChatModel")
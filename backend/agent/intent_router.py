@@ -0,0 +1,117 @@
+"""Deterministic fast path in front of the LLM agent.
+
+Queries whose intent and arguments can be read straight off the text (the
+dashboard templates, "approve req_xxx", "what's my balance") are dispatched to
+the matching tool without a model call. Anything else falls through to the
+agent.
+"""
+import os
+import re
+from dataclasses import dataclass
+from typing import Optional
+
+FAST_PATH_MIN_CONFIDENCE = float(os.environ.get("FAST_PATH_MIN_CONFIDENCE", "0.9"))
+
+LEAVE_TYPES = r"(casual|sick|earned)[ _]leave"
+REQUEST_ID = r"(req_[0-9a-z]+)"
+
+
+@dataclass
+class IntentMatch:
+    tool: str
+    args: dict
+    confidence: float
+
+
+def normalize_query(query: str) -> str:
+    return re.sub(r"\s+", " ", query.strip().lower()).rstrip(" .!?")
+
+
+_MANAGE = re.compile(rf"^(approve|reject)(?: the)?(?: leave)?(?: request)? {REQUEST_ID}$")
+_APPLY = re.compile(
+    rf"^apply for {LEAVE_TYPES} for (\d+) days?, starting on (\d{{4}}-\d{{2}}-\d{{2}})\. the reason is: (.+)$",
+    re.DOTALL,
+)
+_BALANCE = re.compile(
+    r"^(?:(?:get|show|check|view)(?: me)? my|what(?:'s| is| are) my|my)(?: current)?(?: leave)? balances?$"
+)
+_HISTORY = re.compile(
+    r"^(?:(?:get|show|check|view)(?: me)? my|what(?:'s| is) my|my)(?: entire| full)?"
+    r" leave (?:history|status|requests)$"
+)
+_PENDING = re.compile(
+    r"^(?:(?:get|show|list|view)(?: me)?(?: all)? pending(?: leave)? requests"
+    r"|who needs(?: leave)? approval)$"
+)
+
+
+def classify(query: str, user_id: str) -> Optional[IntentMatch]:
+    text = normalize_query(query)
+
+    m = _MANAGE.match(text)
+    if m:
+        action = 'approved' if m.group(1) == 'approve' else 'rejected'
+        return IntentMatch("manage_leave_request",
+                           {"manager_id": user_id, "request_id": m.group(2), "action": action}, 1.0)
+
+    # The reason is free text, so match the original casing rather than the normalised query.
+    m = _APPLY.match(query.strip().lower())
+    if m:
+        reason = query.strip()[m.start(4):]
+        return IntentMatch("apply_for_leave", {
+            "user_id": user_id,
+            "leave_type": f"{m.group(1)}_leave",
+            "number_of_days": int(m.group(2)),
+            "start_date": m.group(3),
+            "reason": reason,
+        }, 1.0)
+
+    if _BALANCE.match(text):
+        return IntentMatch("get_leave_balance", {"user_id": user_id}, 1.0)
+    if _HISTORY.match(text):
+        return IntentMatch("check_leave_status", {"user_id": user_id}, 1.0)
+    if _PENDING.match(text):
+        return IntentMatch("get_all_pending_requests", {"manager_id": user_id}, 1.0)
+
+    # Looser keyword matches; only used when FAST_PATH_MIN_CONFIDENCE is lowered.
+    words = set(re.findall(r"[a-z_]+", text))
+    if "balance" in words and not words & {"apply", "approve", "reject"}:
+        return IntentMatch("get_leave_balance", {"user_id": user_id}, 0.7)
+    if "pending" in words and not words & {"apply", "approve", "reject"}:
+        return IntentMatch("get_all_pending_requests", {"manager_id": user_id}, 0.7)
+    return None
+
+
+class FastPathStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.by_tool = {}
+
+    def record(self, match: Optional[IntentMatch]):
+        if match is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.by_tool[match.tool] = self.by_tool.get(match.tool, 0) + 1
+
+    def as_dict(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "hits_by_tool": dict(self.by_tool),
+        }
+
+
+fast_path_stats = FastPathStats()
+
+
+def match_fast_path(query: str, user_id: str) -> Optional[IntentMatch]:
+    """Return the confident match for ``query``, or ``None`` when it should go to the LLM."""
+    match = classify(query, user_id)
+    if match is not None and match.confidence < FAST_PATH_MIN_CONFIDENCE:
+        match = None
+    fast_path_stats.record(match)
+    return match
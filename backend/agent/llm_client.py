@@ -0,0 +1,176 @@
+"""Upstream model access: one pooled HTTP client and a global in-flight limit.
+
+Every chat model shares one keep-alive connection pool. Calls take a slot
+from ``llm_limiter`` before they go upstream. Callers beyond
+``LLM_MAX_IN_FLIGHT`` wait in FIFO order. Once ``LLM_MAX_QUEUE`` callers are
+already waiting, a new call fails fast with ``LLMQueueFull``, which the API
+turns into a 503 with Retry-After. 429s and 5xx responses are retried by the
+OpenAI client with jittered exponential backoff, honouring the provider's
+Retry-After, while the call keeps its slot.
+"""
+import asyncio
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+
+import httpx
+from langchain_openai import ChatOpenAI
+
+from api.observability import (
+    LLM_HTTP_RESPONSES, LLM_QUEUE_REJECTED, LLM_QUEUE_WAIT_SECONDS, metrics_callback, record_span,
+)
+
+LLM_MAX_IN_FLIGHT = int(os.environ.get("LLM_MAX_IN_FLIGHT", "16"))
+LLM_MAX_QUEUE = int(os.environ.get("LLM_MAX_QUEUE", "64"))
+LLM_QUEUE_RETRY_AFTER = int(os.environ.get("LLM_QUEUE_RETRY_AFTER", "2"))
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", "3"))
+LLM_TIMEOUT = float(os.environ.get("LLM_TIMEOUT", "60"))
+
+
+class LLMQueueFull(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f"Too many requests are waiting for the model; retry in {retry_after}s.")
+        self.retry_after = retry_after
+
+
+_holding_slot = ContextVar("holding_llm_slot", default=False)
+
+
+class LLMLimiter:
+    """FIFO-fair cap on concurrent upstream calls with a bounded wait queue."""
+
+    def __init__(self, max_in_flight, max_queue, retry_after):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self._in_flight = 0
+        self._waiters = deque()
+        self.rejected = 0
+        self.queued_total = 0
+        self.wait_seconds_total = 0.0
+
+    async def _acquire(self):
+        if self._in_flight < self.max_in_flight and not self._waiters:
+            self._in_flight += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            LLM_QUEUE_REJECTED.inc()
+            raise LLMQueueFull(self.retry_after)
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.queued_total += 1
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._release()  # The slot was handed over just as we were cancelled.
+            else:
+                self._waiters.remove(waiter)
+            raise
+
+    def _release(self):
+        # Hand the slot straight to the oldest waiter, so newcomers cannot overtake the queue.
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._in_flight -= 1
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold one upstream slot; yields the seconds spent queueing for it."""
+        if _holding_slot.get():
+            yield 0.0
+            return
+        started = time.perf_counter()
+        await self._acquire()
+        waited = time.perf_counter() - started
+        self.wait_seconds_total += waited
+        LLM_QUEUE_WAIT_SECONDS.observe(waited)
+        record_span("llm.queue", started, waited)
+        token = _holding_slot.set(True)
+        try:
+            yield waited
+        finally:
+            _holding_slot.reset(token)
+            self._release()
+
+    def stats(self) -> dict:
+        return {
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "in_flight": self._in_flight,
+            "queued": len(self._waiters),
+            "queued_total": self.queued_total,
+            "rejected": self.rejected,
+            "wait_seconds_total": round(self.wait_seconds_total, 3),
+        }
+
+
+llm_limiter = LLMLimiter(LLM_MAX_IN_FLIGHT, LLM_MAX_QUEUE, LLM_QUEUE_RETRY_AFTER)
+
+
+async def _count_response(response):
+    LLM_HTTP_RESPONSES.labels(str(response.status_code)).inc()
+
+
+# Created lazily: an AsyncClient binds to the event loop it is first used on.
+_http_client = None
+
+
+def shared_http_client():
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=int(os.environ.get("LLM_HTTP_MAX_CONNECTIONS", str(LLM_MAX_IN_FLIGHT * 2))),
+                max_keepalive_connections=LLM_MAX_IN_FLIGHT,
+                keepalive_expiry=float(os.environ.get("LLM_HTTP_KEEPALIVE_SECONDS", "60")),
+            ),
+            timeout=httpx.Timeout(LLM_TIMEOUT, connect=10.0),
+            event_hooks={"response": [_count_response]},
+        )
+    return _http_client
+
+
+async def close_http_client():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+class LimitedChatOpenAI(ChatOpenAI):
+    """``ChatOpenAI`` whose async calls go through ``llm_limiter``."""
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        async with llm_limiter.slot() as waited:
+            if run_manager is not None:
+                metrics_callback.exclude_queue_wait(run_manager.run_id, waited)
+            return await super()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        async with llm_limiter.slot() as waited:
+            if run_manager is not None:
+                metrics_callback.exclude_queue_wait(run_manager.run_id, waited)
+            async for chunk in super()._astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                yield chunk
+
+
+def build_llm(model=None):
+    return LimitedChatOpenAI(
+        model=model or os.environ.get("OPENROUTER_MODEL"),
+        openai_api_base=os.environ.get("OPENROUTER_API_BASE", "https://openrouter.ai/api/v1"),
+        openai_api_key=os.environ.get("OPENROUTER_API_KEY"),
+        temperature=0.0,
+        streaming=False,
+        callbacks=[metrics_callback],
+        stream_usage=True,
+        max_retries=LLM_MAX_RETRIES,
+        request_timeout=LLM_TIMEOUT,
+        http_async_client=shared_http_client(),
+    )
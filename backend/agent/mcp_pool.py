@@ -0,0 +1,177 @@
+"""Pool of long-lived MCP tool server sessions.
+
+Each slot owns one ``python -m api.mcp_tool`` subprocess for the lifetime of
+the app, so a tool call is one JSON-RPC round trip instead of an interpreter
+start plus a data load. Callers check a session out, call the tool and hand it
+back; a session whose subprocess dies is torn down and restarted in place.
+
+Every subprocess holds its own store, so with more than one slot use
+``LEAVE_STORE_BACKEND=sqlite`` to keep writes from different slots consistent.
+"""
+import asyncio
+import json
+import os
+import sys
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), '..')
+START_ATTEMPTS = 3  # Failed first starts of a slot before start() gives up.
+START_TIMEOUT = 30.0
+
+
+def default_pool_size() -> int:
+    if "MCP_POOL_SIZE" in os.environ:
+        return int(os.environ["MCP_POOL_SIZE"])
+    return 4 if os.environ.get("LEAVE_STORE_BACKEND") == "sqlite" else 1
+
+
+def tool_server_params() -> StdioServerParameters:
+    return StdioServerParameters(
+        command=sys.executable,
+        args=["-m", "api.mcp_tool"],
+        cwd=os.path.abspath(BACKEND_DIR),
+        env=dict(os.environ),
+    )
+
+
+def _result_to_output(result):
+    text = "".join(getattr(c, "text", "") for c in result.content)
+    if getattr(result, "is_error", None) or getattr(result, "isError", None):
+        return {"success": False, "error": text or "The MCP tool call failed."}
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return text
+
+
+def _root_cause(error):
+    # stdio_client runs in an anyio task group, which wraps the real error in exception groups.
+    while isinstance(error, BaseExceptionGroup) and error.exceptions:
+        error = error.exceptions[0]
+    return error
+
+
+class _Slot:
+    def __init__(self, index):
+        self.index = index
+        self.session = None
+        self.broken = asyncio.Event()
+        self.queued = False  # Sitting in the pool's idle queue.
+        self.error = None  # Why the slot never started, once it has given up.
+
+
+class MCPSessionPool:
+    def __init__(self, size=None, server_params=None, call_timeout=30.0):
+        self.size = size or default_pool_size()
+        self.server_params = server_params or tool_server_params()
+        self.call_timeout = call_timeout
+        self._idle = asyncio.Queue()
+        self._workers = []
+        self._closing = False
+        self._waiting = 0
+        self._busy = 0
+        self.restarts = 0
+        self.calls = 0
+        self.failures = 0
+
+    async def start(self):
+        ready = [asyncio.Event() for _ in range(self.size)]
+        slots = [_Slot(i) for i in range(self.size)]
+        self._workers = [
+            asyncio.create_task(self._run_slot(slot, ready[slot.index]), name=f"mcp-session-{slot.index}")
+            for slot in slots
+        ]
+        await asyncio.gather(*(event.wait() for event in ready))
+        failed = next((slot for slot in slots if slot.error is not None), None)
+        if failed is not None:
+            # A tool server that cannot start once will not start on retry either: fail the app's startup.
+            await self.close()
+            raise RuntimeError(f"MCP tool server failed to start after {START_ATTEMPTS} attempts: {failed.error!r}")
+
+    async def _run_slot(self, slot, ready):
+        # The stdio/session context managers must be entered and exited in the same task,
+        # so each slot lives in its own task for as long as the pool is open.
+        failed_starts = 0
+        while not self._closing:
+            try:
+                async with stdio_client(self.server_params) as (reader, writer):
+                    async with ClientSession(reader, writer) as session:
+                        await asyncio.wait_for(session.initialize(), START_TIMEOUT)
+                        slot.session = session
+                        slot.broken.clear()
+                        self._release(slot)
+                        ready.set()
+                        await slot.broken.wait()
+            except Exception as e:
+                e = _root_cause(e)
+                print(f"MCP session {slot.index} failed: {e!r}")
+                if not ready.is_set():
+                    failed_starts += 1
+                    if failed_starts >= START_ATTEMPTS:
+                        slot.error = e
+                        ready.set()
+                        return
+            finally:
+                slot.session = None
+            if not self._closing:
+                self.restarts += 1
+                await asyncio.sleep(0.5)
+
+    def _release(self, slot):
+        # A slot whose session died while idle is still queued when it restarts; never queue it twice.
+        if not slot.queued:
+            slot.queued = True
+            self._idle.put_nowait(slot)
+
+    async def _checkout(self):
+        while True:
+            slot = await self._idle.get()
+            slot.queued = False
+            if slot.session is not None and not slot.broken.is_set():
+                return slot
+            # Restarting: _run_slot queues it again once the new session is up.
+
+    async def call_tool(self, name: str, arguments: dict):
+        self._waiting += 1
+        try:
+            slot = await self._checkout()
+        finally:
+            self._waiting -= 1
+
+        self._busy += 1
+        self.calls += 1
+        try:
+            result = await asyncio.wait_for(slot.session.call_tool(name, arguments), self.call_timeout)
+        except BaseException as e:
+            # The subprocess may be dead or wedged, or a cancelled call may have left a reply in
+            # flight; restart this slot rather than hand it out again.
+            if not isinstance(e, asyncio.CancelledError):
+                self.failures += 1
+            slot.broken.set()
+            raise
+        else:
+            self._release(slot)
+        finally:
+            self._busy -= 1
+        return _result_to_output(result)
+
+    async def close(self):
+        self._closing = True
+        while not self._idle.empty():
+            self._idle.get_nowait().broken.set()
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "idle": self._idle.qsize(),
+            "busy": self._busy,
+            "queue_depth": self._waiting,
+            "calls": self.calls,
+            "failures": self.failures,
+            "restarts": self.restarts,
+        }
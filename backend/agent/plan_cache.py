@@ -0,0 +1,111 @@
+"""Cache of the model's tool choice for repeated queries.
+
+Only the plan (tool name + arguments) is cached, never the tool output, so a
+hit still runs the tool against live data. Keys cover the normalised query,
+role, user, a version hash of the tool schemas and system prompt template, and
+today's date, so plans for relative dates ("tomorrow") do not outlive the day.
+"""
+import atexit
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+
+from agent.intent_router import normalize_query
+
+
+def plan_schema_version(tools, system_prompt: str) -> str:
+    h = hashlib.sha256(system_prompt.encode())
+    for tool in sorted(tools, key=lambda t: t.name):
+        h.update(json.dumps({
+            "name": tool.name,
+            "description": tool.description,
+            "args": tool.args_schema.model_json_schema(),
+        }, sort_keys=True).encode())
+    return h.hexdigest()[:16]
+
+
+class PlanCache:
+    def __init__(self, max_entries=1024, ttl_seconds=3600.0, path=None, save_every=50):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.path = path
+        self.save_every = save_every
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._unsaved = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if path and os.path.exists(path):
+            self.load()
+
+    @staticmethod
+    def key(query: str, role: str, user_id: str, schema_version: str) -> str:
+        raw = json.dumps([normalize_query(query), role, user_id, schema_version, date.today().isoformat()])
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.time():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1], entry[2]
+
+    def put(self, key, tool_name: str, tool_args: dict):
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl_seconds, tool_name, tool_args)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            self._unsaved += 1
+            save_now = self.path and self._unsaved >= self.save_every
+        if save_now:
+            self.save()
+
+    def load(self):
+        with open(self.path, 'r') as f:
+            rows = json.load(f)
+        now = time.time()
+        with self._lock:
+            for key, expires_at, tool_name, tool_args in rows[-self.max_entries:]:
+                if expires_at > now:
+                    self._entries[key] = (expires_at, tool_name, tool_args)
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            rows = [[k, *entry] for k, entry in self._entries.items()]
+            self._unsaved = 0
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(rows, f)
+        os.replace(tmp_path, self.path)
+
+    def as_dict(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+plan_cache = PlanCache(
+    max_entries=int(os.environ.get("PLAN_CACHE_MAX_ENTRIES", "1024")),
+    ttl_seconds=float(os.environ.get("PLAN_CACHE_TTL_SECONDS", "3600")),
+    path=os.environ.get("PLAN_CACHE_PATH") or None,
+)
+atexit.register(plan_cache.save)
@@ -0,0 +1,166 @@
+"""Org-wide leave accrual and year-end carry-forward.
+
+    python -m api.accrual accrue --months 1 --dry-run
+    python -m api.accrual year-end --diff-out /tmp/year_end.jsonl
+
+Every user's balances are loaded into one NumPy column per leave type, the
+policy in ``data/leave_policy.json`` (or ``LEAVE_POLICY_PATH``) is applied to
+whole columns at once, and the changed balances are written back as a single
+``set_balances`` update inside the same store transaction. A dry run stops
+before the write. Either way the run returns a diff report.
+
+Run from the command line next to a server, the transaction is what keeps the
+two apart: on the json backend it holds the data directory's ``store.lock``,
+so the server's writes wait for the run and are reloaded after it rather than
+overwritten; SQLite serialises the writers itself; and the journal backend
+belongs to the server, so there the command refuses to run.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Optional
+
+import numpy as np
+from pydantic import BaseModel
+
+from api.store import StoreLockedError, get_store
+
+POLICY_PATH = os.environ.get("LEAVE_POLICY_PATH") or os.path.join(os.path.dirname(__file__), '..', 'data', 'leave_policy.json')
+SAMPLE_SIZE = 20
+
+
+class LeaveTypePolicy(BaseModel):
+    monthly_accrual: int = 0
+    max_balance: Optional[int] = None  # Accrual stops here; a balance already above it is left alone.
+    carry_forward_cap: Optional[int] = None  # Year end: at most this much is carried into the new year.
+    year_start_grant: int = 0  # Year end: added after the carry-forward cap.
+    reset_to: Optional[int] = None  # Year end: overrides the two above.
+
+
+def load_policy(path=POLICY_PATH) -> dict:
+    with open(path, 'r') as f:
+        return {leave_type: LeaveTypePolicy(**rules) for leave_type, rules in json.load(f).items()}
+
+
+def accrue(column, policy: LeaveTypePolicy, months=1):
+    if not policy.monthly_accrual:
+        return column
+    grown = column + policy.monthly_accrual * months
+    if policy.max_balance is not None:
+        grown = np.minimum(grown, policy.max_balance)
+    return np.maximum(column, grown)
+
+
+def year_end(column, policy: LeaveTypePolicy):
+    if policy.reset_to is not None:
+        return np.full_like(column, policy.reset_to)
+    if policy.carry_forward_cap is not None:
+        column = np.minimum(column, policy.carry_forward_cap)
+    return column + policy.year_start_grant
+
+
+OPERATIONS = {
+    "accrue": lambda column, policy, months: accrue(column, policy, months),
+    "year-end": lambda column, policy, months: year_end(column, policy),
+}
+
+
+def to_columns(users, leave_types):
+    """``(user_ids, balances, present)``: an (n_users, n_types) int64 matrix and a mask of
+    which users have each leave type at all; missing types are never touched."""
+    user_ids = [u['user_id'] for u in users]
+    balances = np.zeros((len(users), len(leave_types)), dtype=np.int64)
+    present = np.zeros(balances.shape, dtype=bool)
+    for j, leave_type in enumerate(leave_types):
+        values = [u['leave_balances'].get(leave_type) for u in users]
+        present[:, j] = np.fromiter((v is not None for v in values), dtype=bool, count=len(values))
+        balances[:, j] = np.fromiter((v or 0 for v in values), dtype=np.int64, count=len(values))
+    return user_ids, balances, present
+
+
+def diff_report(user_ids, leave_types, before, after, present):
+    """Summary of the run plus the ``(row, column)`` positions of every changed balance."""
+    changed = present & (after != before)
+    delta = after - before
+    report = {"users": len(user_ids), "users_changed": int(changed.any(axis=1).sum()), "leave_types": {}}
+    for j, leave_type in enumerate(leave_types):
+        rows = changed[:, j]
+        report["leave_types"][leave_type] = {
+            "users_changed": int(rows.sum()),
+            "total_before": int(before[present[:, j], j].sum()),
+            "total_after": int(after[present[:, j], j].sum()),
+            "min_delta": int(delta[rows, j].min()) if rows.any() else 0,
+            "max_delta": int(delta[rows, j].max()) if rows.any() else 0,
+        }
+    return report, np.nonzero(changed)
+
+
+def _changes(user_ids, leave_types, before, after, positions):
+    rows, cols = positions
+    for r, c, old, new in zip(rows.tolist(), cols.tolist(), before[positions].tolist(), after[positions].tolist()):
+        yield {"user_id": user_ids[r], "leave_type": leave_types[c], "before": old, "after": new}
+
+
+def run(operation, months=1, dry_run=False, policy_path=POLICY_PATH, diff_out=None, store=None):
+    """Apply ``operation`` ('accrue' or 'year-end') to every user and return the diff report."""
+    policy = load_policy(policy_path)
+    leave_types = list(policy)
+    store = store or get_store()
+    timings = {}
+    with store.transaction():
+        started = time.perf_counter()
+        user_ids, before, present = to_columns(store.all_users(), leave_types)
+        timings["load"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        after = before.copy()
+        for j, leave_type in enumerate(leave_types):
+            after[:, j] = OPERATIONS[operation](before[:, j], policy[leave_type], months)
+        after = np.where(present, after, before)
+        report, positions = diff_report(user_ids, leave_types, before, after, present)
+        timings["compute"] = time.perf_counter() - started
+
+        if not dry_run and len(positions[0]):
+            started = time.perf_counter()
+            rows, cols = positions
+            updates = {}
+            for r, c, value in zip(rows.tolist(), cols.tolist(), after[positions].tolist()):
+                updates.setdefault(user_ids[r], {})[leave_types[c]] = value
+            store.set_balances(updates)
+            timings["write"] = time.perf_counter() - started
+
+    if diff_out:
+        with open(diff_out, 'w') as f:
+            f.writelines(json.dumps(change) + '\n' for change in _changes(user_ids, leave_types, before, after, positions))
+    sample = (positions[0][:SAMPLE_SIZE], positions[1][:SAMPLE_SIZE])
+    return {
+        "operation": operation,
+        "months": months if operation == "accrue" else None,
+        "dry_run": dry_run,
+        **report,
+        "sample": list(_changes(user_ids, leave_types, before, after, sample)),
+        "seconds": {phase: round(s, 3) for phase, s in timings.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("operation", choices=OPERATIONS)
+    parser.add_argument("--months", type=int, default=1, help="Months of accrual to add (accrue only).")
+    parser.add_argument("--dry-run", action="store_true", help="Report the changes without writing them.")
+    parser.add_argument("--policy", default=POLICY_PATH)
+    parser.add_argument("--diff-out", help="Also write every changed balance here, one JSON line each.")
+    args = parser.parse_args()
+    if args.months < 1:
+        sys.exit("--months must be at least 1")
+    try:
+        report = run(args.operation, args.months, args.dry_run, args.policy, args.diff_out)
+    except StoreLockedError as e:
+        sys.exit(str(e))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
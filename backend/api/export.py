@@ -0,0 +1,150 @@
+"""Streaming export of leave requests, joined with the requester's name, role and team.
+
+    python -m api.export --format csv --status approved --start-from 2025-01-01 > approved.csv
+    python -m api.export --format parquet --out history.parquet
+
+Requests are read one keyset page of ``chunk_size`` at a time (see
+``page_requests``), archived years first, so memory stays flat however long
+the history is. CSV is
+produced chunk by chunk. Parquet, which needs the optional ``pyarrow``
+package, gets one row group per chunk.
+"""
+import argparse
+import csv
+import functools
+import io
+import sys
+from datetime import date, timedelta
+
+from api.store import get_store
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+DEFAULT_CHUNK_SIZE = 5000
+MAX_CHUNK_SIZE = 50000
+COLUMNS = ("request_id", "user_id", "name", "role", "team", "leave_type", "start_date", "end_date",
+           "number_of_days", "reason", "status")
+FORMATS = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+
+
+@functools.lru_cache(maxsize=4096)
+def _last_day(start_date, number_of_days):
+    return (date.fromisoformat(start_date) + timedelta(days=number_of_days - 1)).isoformat()
+
+
+def iter_chunks(status=None, start_from=None, start_to=None, chunk_size=DEFAULT_CHUNK_SIZE, store=None):
+    """Lists of up to ``chunk_size`` row tuples in ``COLUMNS`` order, oldest request first."""
+    store = store or get_store()
+    filters = {k: v.isoformat() if isinstance(v, date) else v
+               for k, v in (("start_from", start_from), ("start_to", start_to)) if v}
+    # Archived years come first, and only those the date range reaches are read.
+    years = [] if status == 'pending' else [
+        y for y in store.archived_years()
+        if (start_from is None or y >= start_from.year) and (start_to is None or y <= start_to.year)]
+    cursor = None
+    while True:
+        page, cursor = store.page_requests(status=status, filters=filters, after=cursor, limit=chunk_size,
+                                           archived_years=years)
+        profiles = store.user_profiles(r['user_id'] for r in page)
+        rows = [
+            (r['request_id'], r['user_id'], *profiles.get(r['user_id'], (None, None, None)), r['leave_type'],
+             r['start_date'], _last_day(r['start_date'], r['number_of_days']), r['number_of_days'],
+             r['reason'], r['status'])
+            for r in page
+        ]
+        if rows:
+            yield rows
+        if cursor is None:
+            return
+
+
+def to_csv(chunks):
+    """CSV text, one string per chunk; the first one starts with the header."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(COLUMNS)
+    for rows in chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()  # Header only: nothing matched.
+
+
+class _Drain(io.RawIOBase):
+    """A write-only file that hands back whatever was written since the last ``drain()``."""
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def to_parquet(chunks):
+    """Parquet bytes, flushed after every row group."""
+    if pa is None:
+        raise RuntimeError("Parquet export needs the pyarrow package (pip install pyarrow).")
+    schema = pa.schema([(c, pa.int32() if c == "number_of_days" else pa.string()) for c in COLUMNS])
+    sink = _Drain()
+    with pq.ParquetWriter(sink, schema) as writer:
+        for rows in chunks:
+            writer.write_table(pa.Table.from_arrays([list(c) for c in zip(*rows)], schema=schema))
+            yield sink.drain()
+    yield sink.drain()  # The footer, written on close.
+
+
+ENCODERS = {"csv": to_csv, "parquet": to_parquet}
+
+
+def export(fmt, **filters):
+    """The encoded export as an iterator of ``str`` (CSV) or ``bytes`` (Parquet) pieces."""
+    return ENCODERS[fmt](iter_chunks(**filters))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--format", choices=FORMATS, default="csv")
+    parser.add_argument("--status", choices=("pending", "approved", "rejected"))
+    parser.add_argument("--start-from", type=date.fromisoformat, help="Only requests starting on or after this date.")
+    parser.add_argument("--start-to", type=date.fromisoformat, help="Only requests starting on or before this date.")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--out", help="Output file (default: stdout).")
+    args = parser.parse_args()
+
+    pieces = export(args.format, status=args.status, start_from=args.start_from, start_to=args.start_to,
+                    chunk_size=args.chunk_size)
+    binary = args.format == "parquet"
+    if args.out:
+        out = open(args.out, 'wb' if binary else 'w', newline='' if not binary else None)
+    else:
+        out = sys.stdout.buffer if binary else sys.stdout
+    try:
+        for piece in pieces:
+            out.write(piece)
+    finally:
+        if args.out:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
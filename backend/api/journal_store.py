@@ -0,0 +1,213 @@
+"""Append-only journal storage for the leave store.
+
+State is a JSON snapshot plus a JSONL journal of the mutations made since.
+Each store transaction appends its records in one write, so write cost does
+not depend on how much history the snapshot holds. A background compactor
+folds the journal into a fresh snapshot and swaps it in with ``os.replace``.
+
+The in-memory state is the truth, so only one process may own a journal: it
+takes an exclusive lock on ``store_journal.lock`` on first use and keeps it
+until ``close()``, and any other process gets ``StoreLockedError``.
+"""
+import json
+import os
+import threading
+import time
+
+from api.observability import observe_store_io
+from api.store import (
+    DATA_DIR, LeaveStore, lock_file, read_json_db, _copy_user,
+    USERS_DB_PATH, LEAVE_REQUESTS_DB_PATH,
+)
+
+SNAPSHOT_PATH = os.path.join(DATA_DIR, 'store_snapshot.json')
+JOURNAL_PATH = os.path.join(DATA_DIR, 'store_journal.jsonl')
+
+
+def _write_atomic(path, pieces):
+    started = time.perf_counter()
+    tmp_path = f"{path}.tmp"
+    nbytes = 0
+    with open(tmp_path, 'w') as f:
+        for piece in pieces:
+            f.write(piece)
+            nbytes += len(piece)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    observe_store_io("write", path, started, nbytes)
+
+
+def _snapshot_json(seq, users, requests):
+    """``json.dumps`` of the snapshot, in pieces: requests are encoded one at a time from the table."""
+    yield f'{{"seq": {seq}, "users": {json.dumps(users)}, "leave_requests": ['
+    separator = ''
+    for req in requests.rows():
+        yield separator + json.dumps(req)
+        separator = ', '
+    yield ']}'
+
+
+class JournalLeaveStore(LeaveStore):
+    """``LeaveStore`` persisted as snapshot + journal instead of whole-file rewrites.
+
+    The first boot seeds the snapshot from users.json and leave_requests.json;
+    after that this process owns the data and the JSON files are not watched.
+    """
+
+    def __init__(self, snapshot_path=SNAPSHOT_PATH, journal_path=JOURNAL_PATH,
+                 users_path=USERS_DB_PATH, requests_path=LEAVE_REQUESTS_DB_PATH, fsync=True):
+        super().__init__(users_path, requests_path)
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path
+        self.fsync = fsync
+        self._loaded = False
+        self._seq = 0
+        self._snapshot_seq = 0
+        self._pending = []
+        self._journal = None
+        self._owner = None
+        self._compacting_tail = None
+        self._compactor = None
+        self._stop = threading.Event()
+
+    # Loading
+
+    def claim(self):
+        """Lock the journal for this process, or raise ``StoreLockedError`` if another one has it."""
+        with self.lock:
+            if self._owner is None:
+                self._owner = lock_file(f"{os.path.splitext(self.journal_path)[0]}.lock", blocking=False)
+
+    def _lock_files(self):
+        pass  # claim() holds the journal lock for the whole process instead.
+
+    def _unlock_files(self):
+        pass
+
+    def _refresh(self):
+        if self._loaded:
+            return
+        self.claim()
+        if os.path.exists(self.snapshot_path):
+            snapshot = read_json_db(self.snapshot_path)
+        else:
+            snapshot = {
+                'seq': 0,
+                'users': read_json_db(self.users_path),
+                'leave_requests': read_json_db(self.requests_path),
+            }
+        self._load_users(snapshot['users'])
+        self._load_requests(snapshot['leave_requests'])
+        self._seq = self._snapshot_seq = snapshot['seq']
+        for record in self._read_journal():
+            if record['seq'] > self._seq:
+                self._apply(record)
+                self._seq = record['seq']
+        self._loaded = True
+
+    def _read_journal(self):
+        if not os.path.exists(self.journal_path):
+            return []
+        records = []
+        good_size = 0
+        with open(self.journal_path, 'rb') as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    break
+                good_size += len(line)
+        if good_size != os.path.getsize(self.journal_path):
+            # A torn final record from a crash mid-append; cut it off so new appends start on a clean line.
+            print(f"Truncating incomplete journal record in {self.journal_path}")
+            with open(self.journal_path, 'r+b') as f:
+                f.truncate(good_size)
+        return records
+
+    # Persistence
+
+    def _log(self, record):
+        self._seq += 1
+        self._pending.append({'seq': self._seq, **record})
+
+    def _invalidate(self):
+        self._pending.clear()
+        self._loaded = False
+
+    def _flush(self):
+        if not self._pending:
+            return
+        started = time.perf_counter()
+        lines = ''.join(json.dumps(record) + '\n' for record in self._pending)
+        if self._journal is None:
+            self._journal = open(self.journal_path, 'a')
+        self._journal.write(lines)
+        self._journal.flush()
+        if self.fsync:
+            os.fsync(self._journal.fileno())
+        observe_store_io("append", self.journal_path, started, len(lines))
+        if self._compacting_tail is not None:
+            self._compacting_tail.append(lines)
+        self._pending.clear()
+
+    # Compaction
+
+    def journal_length(self):
+        with self.lock:
+            return self._seq - self._snapshot_seq
+
+    def compact(self):
+        with self.transaction():
+            seq = self._seq
+            if seq == self._snapshot_seq:
+                return False
+            users = [_copy_user(u) for u in self._users_by_id.values()]
+            requests = self._requests.copy()
+            self._compacting_tail = []
+
+        try:
+            # Serialising and writing the snapshot happens outside the lock so writers keep going.
+            _write_atomic(self.snapshot_path, _snapshot_json(seq, users, requests))
+        except BaseException:
+            with self.lock:
+                self._compacting_tail = None
+            raise
+
+        with self.lock:
+            # Records appended while the snapshot was written are the only ones still needed.
+            _write_atomic(self.journal_path, self._compacting_tail)
+            self._compacting_tail = None
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+            self._snapshot_seq = seq
+        return True
+
+    def start_compactor(self, interval=None, min_records=None):
+        interval = interval or float(os.environ.get("LEAVE_JOURNAL_COMPACT_INTERVAL", "60"))
+        min_records = min_records or int(os.environ.get("LEAVE_JOURNAL_COMPACT_MIN_RECORDS", "1000"))
+
+        def run():
+            while not self._stop.wait(interval):
+                if self.journal_length() < min_records:
+                    continue
+                try:
+                    self.compact()
+                except Exception as e:
+                    print(f"Journal compaction failed: {e}")
+
+        self._compactor = threading.Thread(target=run, name="leave-journal-compactor", daemon=True)
+        self._compactor.start()
+
+    def close(self):
+        self._stop.set()
+        if self._compactor is not None:
+            self._compactor.join()
+        with self.lock:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+            if self._owner is not None:
+                self._owner.close()
+                self._owner = None
@@ -1,63 +1,264 @@
 
-from fastapi import FastAPI, HTTPException
+import time
+
+IMPORT_STARTED = time.perf_counter()
+
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from dotenv import load_dotenv
+from datetime import date, datetime
+from contextlib import asynccontextmanager
+from typing import Literal, Optional
+import asyncio
+import json
 import os
+import tempfile
 
 load_dotenv()
 
-from agent.agentic_core import setup_agent
-from api.tools import read_json_db, USERS_DB_PATH
+from agent.agentic_core import build_tools, setup_agent, warm_up
+from agent.batch import plan_batch, plan_single
+from agent.hedging import LLM_HEDGE_MODEL, hedge_stats
+from agent.intent_router import match_fast_path, fast_path_stats
+from agent.llm_client import LLMQueueFull, close_http_client, llm_limiter
+from agent.plan_cache import plan_cache
+from api import export as leave_export, observability, user_import
+from api.store import aiter_blocking, get_store, run_blocking
+from api.tools import (
+    aget_leave_balance, aapply_for_leave, acheck_leave_status,
+    aget_all_pending_requests, amanage_leave_request, ApplyLeaveInput,
+    amanage_leave_requests_bulk, aget_team_calendar, aget_requests_created, LeaveDecision, PendingRequestFilter,
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE,
+)
+
+agent_executors = {}
+# Every tool, regardless of role: plans resolved without the LLM call the tool directly
+# and rely on its own server-side role checks.
+tools_by_name = {}
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    phases = {"import": time.perf_counter() - IMPORT_STARTED}
+    started = time.perf_counter()
+    tools = build_tools()
+    tools_by_name.update({t.name: t for t in tools})
+    try:
+        agent_executors.update(setup_agent(tools))
+    except Exception as e:
+        # The direct endpoints don't need the model, so a bad model config only disables the agent.
+        print(f"Agent setup failed, the /agent endpoints will answer 503: {e}")
+    phases["agent_setup"] = time.perf_counter() - started
+    phases.update(await warm_up())
+    observability.report_cold_start(phases)
+    try:
+        yield
+    finally:
+        await close_http_client()
+
 
 app = FastAPI(
     title="Agentic Leave Management API",
-    description="A single-endpoint API that uses a LangChain agent to handle leave management tasks for both employees and managers.",
-    version="4.0.0"
+    description="A LangChain agent endpoint for free-text leave management queries, plus direct endpoints for the dashboard reads and actions.",
+    version="4.0.0",
+    lifespan=lifespan,
 )
 
+observability.install(app)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000", "null"], 
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Agent-Path", observability.REQUEST_ID_HEADER],
 )
 
-agent_executor = setup_agent()
-
 class LoginRequest(BaseModel):
     user_id: str
 
 class AgentRequest(BaseModel):
     user_id: str
-    role: str  
+    role: Optional[str] = None  # Ignored: the role is read from the server-side user record.
     query: str
 
+class BulkLeaveDecisionRequest(BaseModel):
+    decisions: Optional[list[LeaveDecision]] = None
+    filter: Optional[PendingRequestFilter] = None
+    filter_action: Optional[Literal['approved', 'rejected']] = None
+
+class AgentBatchRequest(BaseModel):
+    user_id: str
+    queries: list[str]
+
+class LeaveDecisionRequest(BaseModel):
+    manager_id: str
+    action: Literal['approved', 'rejected']
+
 @app.get("/")
 def read_root():
     return {"message": "Agentic Leave Management System."}
 
+async def _get_user(user_id: str):
+    return await run_blocking(lambda: get_store().get_user(user_id))
+
 @app.post("/login")
 async def login(request: LoginRequest):
-    users = read_json_db(USERS_DB_PATH)
-    for user in users:
-        if user['user_id'] == request.user_id:
-            return {"success": True, "user": {
-                "id": user['user_id'],
-                "name": user['name'],
-                "role": user.get('role', 'employee')
-            }}
+    user = await _get_user(request.user_id)
+    if user:
+        return {"success": True, "user": {
+            "id": user['user_id'],
+            "name": user['name'],
+            "role": user.get('role', 'employee')
+        }}
     raise HTTPException(status_code=404, detail="User ID not found")
 
+# Direct endpoints: the dashboards already know which tool and arguments they need,
+# so these call the tool functions without an LLM round trip.
+# They use the async tools, so store work runs on the bounded store executor.
+
+@app.get("/users/{user_id}/leave-balance")
+async def leave_balance(user_id: str):
+    return await aget_leave_balance(user_id)
+
+@app.get("/users/{user_id}/leave-requests")
+async def leave_history(user_id: str, status: Optional[Literal['pending', 'approved', 'rejected']] = None,
+                  leave_type: Optional[str] = None, start_from: Optional[date] = None,
+                  start_to: Optional[date] = None, cursor: Optional[str] = None,
+                  limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                  fields: Optional[list[str]] = Query(None), include_archived: bool = False):
+    return await acheck_leave_status(user_id, status, leave_type, start_from, start_to, cursor, limit, fields,
+                                     include_archived)
+
+@app.get("/users/{user_id}/team-calendar")
+async def team_calendar(user_id: str, start_date: date, end_date: date, team: Optional[str] = None):
+    return await aget_team_calendar(user_id, start_date, end_date, team)
+
+@app.get("/managers/{manager_id}/pending-requests")
+async def pending_requests(manager_id: str, leave_type: Optional[str] = None, start_from: Optional[date] = None,
+                     start_to: Optional[date] = None, team: Optional[str] = None,
+                     cursor: Optional[str] = None, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                     fields: Optional[list[str]] = Query(None)):
+    return await aget_all_pending_requests(manager_id, leave_type, start_from, start_to, team, cursor, limit, fields)
+
+@app.get("/managers/{manager_id}/leave-requests/created")
+async def requests_created(manager_id: str, since: datetime, until: Optional[datetime] = None,
+                           cursor: Optional[str] = None, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)):
+    return await aget_requests_created(manager_id, since, until, cursor, limit)
+
+@app.post("/leave-requests")
+async def create_leave_request(request: ApplyLeaveInput):
+    return await aapply_for_leave(**request.model_dump())
+
+@app.post("/leave-requests/{request_id}/decision")
+async def decide_leave_request(request_id: str, request: LeaveDecisionRequest):
+    return await amanage_leave_request(request.manager_id, request_id, request.action)
+
+@app.post("/managers/{manager_id}/leave-requests/bulk-decision")
+async def decide_leave_requests_bulk(manager_id: str, request: BulkLeaveDecisionRequest):
+    return await amanage_leave_requests_bulk(manager_id, request.decisions, request.filter, request.filter_action)
+
+@app.get("/managers/{manager_id}/exports/leave-requests")
+async def export_leave_requests(manager_id: str, format: Literal['csv', 'parquet'] = 'csv',
+                                status: Optional[Literal['pending', 'approved', 'rejected']] = None,
+                                start_from: Optional[date] = None, start_to: Optional[date] = None,
+                                chunk_size: int = Query(leave_export.DEFAULT_CHUNK_SIZE, ge=1, le=leave_export.MAX_CHUNK_SIZE)):
+    if not await run_blocking(get_store().is_manager, manager_id):
+        raise HTTPException(status_code=403, detail="Only managers can export leave requests.")
+    if format == 'parquet' and leave_export.pa is None:
+        raise HTTPException(status_code=501, detail="Parquet export needs the pyarrow package on the server.")
+    pieces = leave_export.export(format, status=status, start_from=start_from, start_to=start_to,
+                                 chunk_size=chunk_size)
+    return StreamingResponse(aiter_blocking(pieces), media_type=leave_export.FORMATS[format], headers={
+        "Content-Disposition": f'attachment; filename="leave_requests.{format}"'})
+
+@app.post("/managers/{manager_id}/users/import")
+async def import_users(manager_id: str, request: Request, format: Literal['csv', 'jsonl'] = 'csv',
+                       dry_run: bool = False):
+    manager = await run_blocking(get_store().get_user, manager_id)
+    if not manager or manager.get('role') != 'manager':
+        raise HTTPException(status_code=403, detail="Only managers can import users.")
+    if not manager.get('team'):
+        raise HTTPException(status_code=403, detail="Imports are limited to your own team, and you have none; "
+                                                    "org-wide feeds go through python -m api.user_import.")
+    # Spool the upload (to disk past a few MB) instead of holding the whole feed in memory.
+    with tempfile.SpooledTemporaryFile(max_size=8 << 20) as feed:
+        async for chunk in request.stream():
+            feed.write(chunk)
+        feed.seek(0)
+        return await run_blocking(user_import.import_file, feed, format, dry_run, manager_id=manager_id)
+
+@app.get("/agent/fast-path/stats")
+def fast_path_statistics():
+    return fast_path_stats.as_dict()
+
+@app.get("/agent/plan-cache/stats")
+def plan_cache_statistics():
+    return plan_cache.as_dict()
+
+@app.get("/agent/llm/stats")
+def llm_statistics():
+    return llm_limiter.stats()
+
+@app.get("/agent/hedge/stats")
+def hedge_statistics():
+    return {"secondary_model": LLM_HEDGE_MODEL, **hedge_stats.as_dict()}
+
+@app.exception_handler(LLMQueueFull)
+async def llm_queue_full(request, exc: LLMQueueFull):
+    # Shed load straight away instead of letting the request hang behind the queue.
+    return JSONResponse(status_code=503, content={"detail": str(exc)},
+                        headers={"Retry-After": str(exc.retry_after)})
+
+async def _executor_for(user_id: str):
+    if not agent_executors:
+        raise HTTPException(status_code=503, detail="The agent is not configured; check the OPENROUTER_* settings.")
+    user = await _get_user(user_id)
+    if user is None:
+        raise HTTPException(status_code=404, detail="User ID not found")
+    role = user.get('role', 'employee')
+    return role, agent_executors.get(role, agent_executors["employee"])
+
+def _plan_cache_key(request: AgentRequest, role: str, executor):
+    return plan_cache.key(request.query, role, request.user_id,
+                          executor.metadata["plan_schema_version"])
+
+def _plan_without_llm(request: AgentRequest, cache_key: str):
+    """Resolve the tool call from the fast path or the plan cache; ``None`` means ask the LLM."""
+    match = match_fast_path(request.query, request.user_id)
+    if match is not None:
+        return "fast_path", match.tool, match.args
+    plan = plan_cache.get(cache_key)
+    if plan is not None:
+        return ("plan_cache", *plan)
+    return None
+
+def _remember_plan(cache_key: str, response: dict):
+    # Cache the plan only when the model answered with a single direct tool call.
+    steps = response.get('intermediate_steps', [])
+    if len(steps) == 1 and isinstance(steps[0][0].tool_input, dict):
+        plan_cache.put(cache_key, steps[0][0].tool, steps[0][0].tool_input)
+
 @app.post("/agent/invoke")
-async def agent_invoke(request: AgentRequest):
-    print(f"Invoking agent for User '{request.user_id}' (Role: {request.role}) with query: '{request.query}'")
+async def agent_invoke(request: AgentRequest, http_response: Response):
+    role, agent_executor = await _executor_for(request.user_id)
+    print(f"Invoking agent for User '{request.user_id}' (Role: {role}) with query: '{request.query}'")
 
     try:
+        cache_key = _plan_cache_key(request, role, agent_executor)
+        plan = _plan_without_llm(request, cache_key)
+        if plan is not None:
+            path, tool_name, tool_args = plan
+            http_response.headers["X-Agent-Path"] = path
+            return await tools_by_name[tool_name].ainvoke(tool_args)
+
+        http_response.headers["X-Agent-Path"] = "llm"
         response = await agent_executor.ainvoke({
             "user_id": request.user_id,
-            "role": request.role,
+            "role": role,
             "query": request.query,
         })
         
@@ -66,8 +267,114 @@ async def agent_invoke(request: AgentRequest):
         if output is None:
             raise HTTPException(status_code=500, detail="Agent returned an empty or invalid response.")
 
+        _remember_plan(cache_key, response)
         return output
 
+    except LLMQueueFull:
+        raise
     except Exception as e:
         print(f"An error occurred while invoking the agent: {e}")
         raise HTTPException(status_code=500, detail=f"An error occurred in the agent: {str(e)}")
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+async def _agent_event_stream(request: AgentRequest, role: str, agent_executor):
+    try:
+        cache_key = _plan_cache_key(request, role, agent_executor)
+        plan = _plan_without_llm(request, cache_key)
+        if plan is not None:
+            path, tool_name, tool_args = plan
+            yield _sse("agent_start", {"path": path})
+            yield _sse("tool_start", {"tool": tool_name, "input": tool_args})
+            output = await tools_by_name[tool_name].ainvoke(tool_args)
+            yield _sse("tool_end", {"tool": tool_name, "output": output})
+            yield _sse("final", {"output": output})
+            return
+
+        yield _sse("agent_start", {"path": "llm"})
+        agent_input = {"user_id": request.user_id, "role": role, "query": request.query}
+        async for event in agent_executor.astream_events(agent_input, version="v2"):
+            kind = event["event"]
+            if kind == "on_tool_start":
+                yield _sse("tool_start", {"tool": event["name"], "input": event["data"].get("input")})
+            elif kind == "on_tool_end":
+                yield _sse("tool_end", {"tool": event["name"], "output": event["data"].get("output")})
+            elif kind == "on_chain_end" and event["name"] == agent_executor.get_name():
+                response = event["data"]["output"]
+                _remember_plan(cache_key, response)
+                yield _sse("final", {"output": response.get('output')})
+    except LLMQueueFull as e:
+        yield _sse("error", {"detail": str(e), "status": 503, "retry_after": e.retry_after})
+    except Exception as e:
+        print(f"An error occurred while streaming the agent: {e}")
+        yield _sse("error", {"detail": f"An error occurred in the agent: {str(e)}"})
+
+@app.post("/agent/stream")
+async def agent_stream(request: AgentRequest):
+    role, agent_executor = await _executor_for(request.user_id)
+    print(f"Streaming agent for User '{request.user_id}' (Role: {role}) with query: '{request.query}'")
+    return StreamingResponse(
+        _agent_event_stream(request, role, agent_executor),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+class _BatchRolledBack(Exception):
+    pass
+
+def _run_tools_consistently(calls: list) -> list:
+    # One store transaction for the whole batch, so every tool sees the same data. A tool that
+    # raises may have written half its changes, so the whole batch is rolled back, not committed.
+    results = []
+    try:
+        with get_store().transaction():
+            for tool_name, tool_args in calls:
+                try:
+                    results.append(tools_by_name[tool_name].invoke(tool_args))
+                except Exception as e:
+                    raise _BatchRolledBack(f"Tool '{tool_name}' failed: {e}") from e
+    except _BatchRolledBack as e:
+        print(f"Batch rolled back: {e}")
+        return [{"success": False, "error": f"{e}. No change from this batch was saved."} for _ in calls]
+    return results
+
+@app.post("/agent/batch")
+async def agent_batch(request: AgentBatchRequest):
+    role, agent_executor = await _executor_for(request.user_id)
+    print(f"Batch-invoking agent for User '{request.user_id}' (Role: {role}) with {len(request.queries)} queries")
+
+    try:
+        single_requests = [AgentRequest(user_id=request.user_id, query=q) for q in request.queries]
+        cache_keys = [_plan_cache_key(r, role, agent_executor) for r in single_requests]
+        plans = [_plan_without_llm(r, k) for r, k in zip(single_requests, cache_keys)]
+
+        unresolved = [i for i, plan in enumerate(plans) if plan is None]
+        if unresolved:
+            queries = [request.queries[i] for i in unresolved]
+            batch = await plan_batch(agent_executor, request.user_id, role, queries)
+            if batch is None:
+                batch = await asyncio.gather(*(
+                    plan_single(agent_executor, request.user_id, role, q) for q in queries
+                ))
+            for i, planned in zip(unresolved, batch):
+                if isinstance(planned, tuple):
+                    plans[i] = ("llm", *planned)
+                    plan_cache.put(cache_keys[i], *planned)
+                else:
+                    plans[i] = ("llm", None, planned)
+
+        calls = [(tool_name, tool_args) for _, tool_name, tool_args in plans if tool_name is not None]
+        tool_outputs = iter(await run_blocking(_run_tools_consistently, calls))
+
+        results = []
+        for query, (path, tool_name, tool_args) in zip(request.queries, plans):
+            output = next(tool_outputs) if tool_name is not None else tool_args
+            results.append({"query": query, "path": path, "output": output})
+        return {"results": results}
+
+    except LLMQueueFull:
+        raise
+    except Exception as e:
+        print(f"An error occurred while batch-invoking the agent: {e}")
+        raise HTTPException(status_code=500, detail=f"An error occurred in the agent: {str(e)}")
@@ -8,7 +8,7 @@ import os
 load_dotenv()
 
 from agent.agentic_core import setup_agent
-from api.tools import read_json_db, USERS_DB_PATH
+from api.store import read_json_db, USERS_DB_PATH
 
 app = FastAPI(
     title="Agentic Leave Management API",
@@ -1,73 +1,139 @@
-# from fastapi import FastAPI, HTTPException
-# from fastapi.middleware.cors import CORSMiddleware
-# from pydantic import BaseModel
-# from dotenv import load_dotenv
-
-# import asyncio
-
-# from api.mcp_tool import read_json_db, USERS_DB_PATH
-# from agent.mcp_core import setup_agent
-
-# load_dotenv()
-
-# app = FastAPI(
-#     title="Agentic Leave Management API with MCP",
-#     description="A single-endpoint API that uses a LangChain agent to handle leave management tasks with tools provided by an MCP server.",
-#     version="5.0.0"
-# )
-
-# app.add_middleware(
-#     CORSMiddleware,
-#     allow_origins=["http://localhost:3000", "null"],
-#     allow_credentials=True,
-#     allow_methods=["*"],
-#     allow_headers=["*"],
-# )
-
-# class LoginRequest(BaseModel):
-#     user_id: str
-
-# class AgentRequest(BaseModel):
-#     user_id: str
-#     role: str
-#     query: str
-
-# agent_executor = asyncio.run(setup_agent())
-
-# @app.get("/")
-# def read_root():
-#     return {"message": "Agentic Leave Management System with MCP."}
-
-# @app.post("/login")
-# async def login(request: LoginRequest):
-#     users = read_json_db(USERS_DB_PATH)
-#     for user in users:
-#         if user['user_id'] == request.user_id:
-#             return {"success": True, "user": {
-#                 "id": user['user_id'],
-#                 "name": user['name'],
-#                 "role": user.get('role', 'employee')
-#             }}
-#     raise HTTPException(status_code=404, detail="User ID not found")
-
-# @app.post("/agent/invoke")
-# async def agent_invoke(request: AgentRequest):
-#     print(f"Invoking agent for User '{request.user_id}' (Role: {request.role}) with query: '{request.query}'")
-
-#     try:
-#         response = await agent_executor.ainvoke({
-#             "user_id": request.user_id,
-#             "role": request.role,
-#             "query": request.query,
-#         })
-
-#         output = response.get('output')
-
-#         if output is None:
-#             raise HTTPException(status_code=500, detail="Agent returned an empty or invalid response.")
-
-#         return output
-
-#     except Exception as e:
-#         print(f"An error occurred while invoking the agent: {e}")
-#         raise HTTPException(status_code=500, detail=f"An error occurred in the agent: {str(e)}")
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from fastapi import FastAPI, HTTPException
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from agent.agentic_core import warm_up
+from agent.intent_router import match_fast_path
+from agent.llm_client import LLMQueueFull, close_http_client, llm_limiter
+from agent.mcp_core import setup_agent
+from agent.mcp_pool import MCPSessionPool
+from api import observability
+from api.store import get_store, run_blocking
+
+agent_executors = {}
+tools_by_name = {}
+pool = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The tool servers live as long as the app: a call reuses a warm session instead of
+    # starting a Python process and reloading the data for every tool invocation.
+    global pool
+    if os.environ.get("LEAVE_STORE_BACKEND") == "journal":
+        # A journal belongs to one process (see api.journal_store), but this app reads users
+        # itself while its tool servers write through their own stores.
+        raise RuntimeError("The MCP app cannot use LEAVE_STORE_BACKEND=journal: the journal can only be "
+                           "opened by one process. Use the json or sqlite backend.")
+    started = time.perf_counter()
+    pool = MCPSessionPool()
+    await pool.start()
+    phases = {"mcp_pool_start": time.perf_counter() - started}
+    started = time.perf_counter()
+    agent_executors.update(setup_agent(pool))
+    tools_by_name.update({t.name: t for executor in agent_executors.values() for t in executor.tools})
+    phases["agent_setup"] = time.perf_counter() - started
+    phases.update(await warm_up())
+    observability.report_cold_start(phases)
+    try:
+        yield
+    finally:
+        await pool.close()
+        await close_http_client()
+
+
+app = FastAPI(
+    title="Agentic Leave Management API with MCP",
+    description="A single-endpoint API that uses a LangChain agent to handle leave management tasks with tools provided by a pool of MCP server sessions.",
+    version="5.0.0",
+    lifespan=lifespan,
+)
+
+observability.install(app)
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["http://localhost:3000", "null"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+    expose_headers=[observability.REQUEST_ID_HEADER],
+)
+
+class LoginRequest(BaseModel):
+    user_id: str
+
+class AgentRequest(BaseModel):
+    user_id: str
+    role: Optional[str] = None  # Ignored: the role is read from the server-side user record.
+    query: str
+
+@app.get("/")
+def read_root():
+    return {"message": "Agentic Leave Management System with MCP."}
+
+@app.post("/login")
+async def login(request: LoginRequest):
+    user = await run_blocking(lambda: get_store().get_user(request.user_id))
+    if user:
+        return {"success": True, "user": {
+            "id": user['user_id'],
+            "name": user['name'],
+            "role": user.get('role', 'employee')
+        }}
+    raise HTTPException(status_code=404, detail="User ID not found")
+
+@app.get("/mcp/pool/stats")
+def mcp_pool_statistics():
+    return pool.stats()
+
+@app.get("/agent/llm/stats")
+def llm_statistics():
+    return llm_limiter.stats()
+
+@app.exception_handler(LLMQueueFull)
+async def llm_queue_full(request, exc: LLMQueueFull):
+    return JSONResponse(status_code=503, content={"detail": str(exc)},
+                        headers={"Retry-After": str(exc.retry_after)})
+
+@app.post("/agent/invoke")
+async def agent_invoke(request: AgentRequest):
+    user = await run_blocking(lambda: get_store().get_user(request.user_id))
+    if user is None:
+        raise HTTPException(status_code=404, detail="User ID not found")
+    role = user.get('role', 'employee')
+    agent_executor = agent_executors.get(role, agent_executors["employee"])
+    print(f"Invoking agent for User '{request.user_id}' (Role: {role}) with query: '{request.query}'")
+
+    try:
+        match = match_fast_path(request.query, request.user_id)
+        if match is not None:
+            return await tools_by_name[match.tool].ainvoke(match.args)
+
+        response = await agent_executor.ainvoke({
+            "user_id": request.user_id,
+            "role": role,
+            "query": request.query,
+        })
+
+        output = response.get('output')
+
+        if output is None:
+            raise HTTPException(status_code=500, detail="Agent returned an empty or invalid response.")
+
+        return output
+
+    except LLMQueueFull:
+        raise
+    except Exception as e:
+        print(f"An error occurred while invoking the agent: {e}")
+        raise HTTPException(status_code=500, detail=f"An error occurred in the agent: {str(e)}")
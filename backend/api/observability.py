@@ -0,0 +1,202 @@
+"""Per-request tracing and Prometheus metrics.
+
+Every HTTP request gets a correlation ID, taken from an incoming
+``X-Request-ID`` or generated, and echoed back in the response headers. While
+the request runs, LLM calls, tool calls and store reads/writes are recorded
+as spans on it and observed into the histograms served at ``/metrics``.
+With ``TRACE_LOG=1`` the finished trace is printed as one JSON line.
+"""
+import json
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from langchain_core.callbacks import BaseCallbackHandler
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+REQUEST_ID_HEADER = "X-Request-ID"
+TRACE_LOG = os.environ.get("TRACE_LOG") == "1"
+
+LATENCY_BUCKETS = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60)
+BYTES_BUCKETS = tuple(2 ** i for i in range(8, 32, 2))
+TOKEN_BUCKETS = (50, 100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "leave_http_request_seconds", "HTTP request latency.", ["method", "route", "status"], buckets=LATENCY_BUCKETS)
+LLM_CALL_SECONDS = Histogram(
+    "leave_llm_call_seconds", "Chat model call latency.", ["model"], buckets=LATENCY_BUCKETS)
+LLM_CALL_TOKENS = Histogram(
+    "leave_llm_call_tokens", "Tokens per chat model call.", ["model", "kind"], buckets=TOKEN_BUCKETS)
+LLM_TOKENS = Counter("leave_llm_tokens", "Tokens sent to and received from the chat model.", ["model", "kind"])
+LLM_QUEUE_WAIT_SECONDS = Histogram(
+    "leave_llm_queue_wait_seconds", "Time spent waiting for an upstream model slot.", buckets=LATENCY_BUCKETS)
+LLM_QUEUE_REJECTED = Counter("leave_llm_queue_rejected", "Model calls turned away because the queue was full.")
+LLM_HTTP_RESPONSES = Counter("leave_llm_http_responses", "Upstream model HTTP responses by status.", ["status"])
+LLM_HEDGES = Counter("leave_llm_hedges", "Model calls that were hedged to the secondary model.")
+LLM_HEDGE_WINS = Counter("leave_llm_hedge_wins", "Model calls answered, by the model that answered first.", ["model"])
+COLD_START_SECONDS = Gauge("leave_cold_start_seconds", "Time spent in each startup phase.", ["phase"])
+TOOL_CALL_SECONDS = Histogram(
+    "leave_tool_call_seconds", "Tool call latency.", ["tool", "status"], buckets=LATENCY_BUCKETS)
+STORE_IO_SECONDS = Histogram(
+    "leave_store_io_seconds", "Store read/write latency.", ["op", "target"], buckets=LATENCY_BUCKETS)
+STORE_IO_BYTES = Histogram(
+    "leave_store_io_bytes", "Bytes per store read/write.", ["op", "target"], buckets=BYTES_BUCKETS)
+
+_trace = ContextVar("leave_trace", default=None)
+
+
+class Trace:
+    def __init__(self, request_id, name):
+        self.request_id = request_id
+        self.name = name
+        self.started = time.perf_counter()
+        self.spans = []
+
+    def as_dict(self, status=None):
+        return {
+            "request_id": self.request_id,
+            "name": self.name,
+            "status": status,
+            "duration_ms": round((time.perf_counter() - self.started) * 1000, 3),
+            "spans": self.spans,
+        }
+
+
+def current_request_id():
+    trace = _trace.get()
+    return trace.request_id if trace else None
+
+
+def record_span(name, started, seconds, **attrs):
+    """Attach a finished span to the current request's trace, if there is one."""
+    trace = _trace.get()
+    if trace is not None:
+        trace.spans.append({
+            "name": name,
+            "offset_ms": round((started - trace.started) * 1000, 3),
+            "duration_ms": round(seconds * 1000, 3),
+            **attrs,
+        })
+
+
+def observe_store_io(op, path, started, nbytes=None):
+    seconds = time.perf_counter() - started
+    target = os.path.basename(path)
+    STORE_IO_SECONDS.labels(op, target).observe(seconds)
+    if nbytes is not None:
+        STORE_IO_BYTES.labels(op, target).observe(nbytes)
+    record_span(f"store.{op}", started, seconds, target=target, bytes=nbytes)
+
+
+@contextmanager
+def store_io(op, path):
+    """Time a store read/write whose size is not known up front."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_store_io(op, path, started)
+
+
+def report_cold_start(phases: dict):
+    for phase, seconds in phases.items():
+        COLD_START_SECONDS.labels(phase).set(seconds)
+    details = ", ".join(f"{phase} {seconds:.2f}s" for phase, seconds in phases.items())
+    print(f"Cold start: {sum(phases.values()):.2f}s ({details})")
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """Times chat model and tool runs. Attach it to the model and the tools themselves,
+    so the fast path and plan cache, which skip the executor, are measured too."""
+
+    run_inline = True  # Cheap bookkeeping; skip the executor hop LangChain uses for sync handlers.
+
+    def __init__(self):
+        self._started = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        model = (kwargs.get("invocation_params") or {}).get("model_name") \
+            or (kwargs.get("invocation_params") or {}).get("model") or "unknown"
+        self._started[run_id] = (time.perf_counter(), model)
+
+    def exclude_queue_wait(self, run_id, seconds):
+        """Start the model clock after the call got its upstream slot, so queueing is not model time."""
+        if run_id in self._started:
+            started, model = self._started[run_id]
+            self._started[run_id] = (started + seconds, model)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        started, model = self._started.pop(run_id, (None, "unknown"))
+        if started is None:
+            return
+        seconds = time.perf_counter() - started
+        LLM_CALL_SECONDS.labels(model).observe(seconds)
+
+        usage = {}
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                if message is not None and getattr(message, "usage_metadata", None):
+                    usage = message.usage_metadata
+        tokens = {"prompt": usage.get("input_tokens"), "completion": usage.get("output_tokens")}
+        for kind, count in tokens.items():
+            if count is not None:
+                LLM_CALL_TOKENS.labels(model, kind).observe(count)
+                LLM_TOKENS.labels(model, kind).inc(count)
+        record_span("llm", started, seconds, model=model,
+                    prompt_tokens=tokens["prompt"], completion_tokens=tokens["completion"])
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        started, model = self._started.pop(run_id, (None, "unknown"))
+        if started is not None:
+            record_span("llm", started, time.perf_counter() - started, model=model, error=str(error))
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        self._started[run_id] = (time.perf_counter(), serialized.get("name", "unknown"))
+
+    def _tool_done(self, run_id, status):
+        started, tool = self._started.pop(run_id, (None, "unknown"))
+        if started is not None:
+            seconds = time.perf_counter() - started
+            TOOL_CALL_SECONDS.labels(tool, status).observe(seconds)
+            record_span("tool", started, seconds, tool=tool, status=status)
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        refused = isinstance(output, dict) and output.get("success") is False
+        self._tool_done(run_id, "refused" if refused else "ok")
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._tool_done(run_id, "error")
+
+
+metrics_callback = MetricsCallbackHandler()
+
+
+def install(app):
+    """Add the correlation-ID/tracing middleware and the ``/metrics`` endpoint to ``app``."""
+    from fastapi import Response
+
+    @app.middleware("http")
+    async def trace_requests(request, call_next):
+        request_id = request.headers.get(REQUEST_ID_HEADER) or uuid.uuid4().hex
+        trace = Trace(request_id, f"{request.method} {request.url.path}")
+        token = _trace.set(trace)
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            response.headers[REQUEST_ID_HEADER] = request_id
+            return response
+        finally:
+            _trace.reset(token)
+            route = request.scope.get("route")
+            HTTP_REQUEST_SECONDS.labels(request.method, getattr(route, "path", "unmatched"), str(status)).observe(
+                time.perf_counter() - trace.started)
+            if TRACE_LOG:
+                print(json.dumps(trace.as_dict(status)))
+
+    @app.get("/metrics", include_in_schema=False)
+    def metrics():
+        return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,124 @@
+"""Compact in-memory leave requests.
+
+As dicts, a million requests cost over a kilobyte each: a hash table per
+record and separate copies of strings like ``'approved'`` and ``'user0004211'``.
+``RequestTable`` keeps them as columns instead. The requester, leave type and
+status are small int codes from process-wide ``Codebook``s, the start date is
+a date ordinal, and all five live in ``array``s. Only the ID and the reason,
+which differ per request, are kept as strings. A request is addressed by its
+row number, and ``row()`` builds the dict the API hands out.
+"""
+import functools
+import threading
+from array import array
+from datetime import date
+
+FIELDS = ("request_id", "user_id", "leave_type", "start_date", "number_of_days", "reason", "status")
+
+
+class Codebook:
+    """Dense int codes for a repeated string, handed out on first sight and never reused."""
+
+    def __init__(self):
+        self.values = []
+        self.codes = {}
+        self._lock = threading.Lock()
+
+    def code(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            with self._lock:
+                code = self.codes.get(value)
+                if code is None:
+                    code = len(self.values)
+                    self.values.append(value)  # Before ``codes``, so a code is always decodable.
+                    self.codes[value] = code
+        return code
+
+
+USER_IDS = Codebook()
+LEAVE_TYPES = Codebook()
+STATUSES = Codebook()
+
+
+@functools.lru_cache(maxsize=8192)
+def to_ordinal(iso_date):
+    return date.fromisoformat(iso_date).toordinal()
+
+
+@functools.lru_cache(maxsize=8192)
+def to_iso(ordinal):
+    return date.fromordinal(ordinal).isoformat()
+
+
+class RequestTable:
+    """Leave requests as parallel columns, in insertion order, plus a ``request_id`` -> row index."""
+
+    __slots__ = ('request_ids', 'reasons', 'users', 'leave_types', 'statuses', 'starts', 'days',
+                 'extras', 'row_of')
+
+    def __init__(self, requests=()):
+        self.request_ids = []
+        self.reasons = []
+        self.users = array('I')
+        self.leave_types = array('H')
+        self.statuses = array('H')
+        self.starts = array('i')
+        self.days = array('i')
+        self.extras = {}  # Fields beyond FIELDS, by row; requests written by this app have none.
+        self.row_of = {}
+        for req in requests:
+            self.append(req)
+
+    def __len__(self):
+        return len(self.request_ids)
+
+    def append(self, req):
+        row = len(self.request_ids)
+        self.request_ids.append(req['request_id'])
+        self.users.append(USER_IDS.code(req['user_id']))
+        self.leave_types.append(LEAVE_TYPES.code(req['leave_type']))
+        self.starts.append(to_ordinal(req['start_date']))
+        self.days.append(req['number_of_days'])
+        self.reasons.append(req['reason'])
+        self.statuses.append(STATUSES.code(req['status']))
+        if len(req) > len(FIELDS):
+            self.extras[row] = {k: v for k, v in req.items() if k not in FIELDS}
+        self.row_of[req['request_id']] = row
+        return row
+
+    def copy(self):
+        table = RequestTable()
+        table.request_ids, table.reasons = self.request_ids[:], self.reasons[:]
+        table.users, table.leave_types, table.statuses = self.users[:], self.leave_types[:], self.statuses[:]
+        table.starts, table.days = self.starts[:], self.days[:]
+        table.extras, table.row_of = dict(self.extras), dict(self.row_of)
+        return table
+
+    def user_id(self, row):
+        return USER_IDS.values[self.users[row]]
+
+    def status(self, row):
+        return STATUSES.values[self.statuses[row]]
+
+    def set_status(self, row, status):
+        self.statuses[row] = STATUSES.code(status)
+
+    def row(self, row):
+        """The request at ``row`` as a new dict."""
+        req = {
+            "request_id": self.request_ids[row],
+            "user_id": USER_IDS.values[self.users[row]],
+            "leave_type": LEAVE_TYPES.values[self.leave_types[row]],
+            "start_date": to_iso(self.starts[row]),
+            "number_of_days": self.days[row],
+            "reason": self.reasons[row],
+            "status": STATUSES.values[self.statuses[row]],
+        }
+        if self.extras:
+            req.update(self.extras.get(row, ()))
+        return req
+
+    def rows(self, rows=None):
+        """Dicts for ``rows`` (default: all of them), built one at a time."""
+        return map(self.row, range(len(self)) if rows is None else rows)
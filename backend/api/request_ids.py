@@ -0,0 +1,72 @@
+"""Time-ordered leave request IDs.
+
+New IDs are ``req_`` plus a 26-character ULID: a 48-bit millisecond timestamp
+and 80 random bits, in lower-case Crockford base32. Within one millisecond the
+random part is incremented instead of redrawn, so IDs minted by this process
+sort in creation order. ``request_id >= time_floor(t)`` then selects the
+requests created at or after ``t``. Legacy ``req_xxxxxx`` IDs are still
+accepted everywhere; they just carry no time.
+"""
+import secrets
+import threading
+import time
+from datetime import datetime, timezone
+
+PREFIX = "req_"
+ALPHABET = "0123456789abcdefghjkmnpqrstvwxyz"  # Ascending in ASCII, so string order is numeric order.
+TIME_CHARS, RANDOM_CHARS = 10, 16
+ID_LENGTH = len(PREFIX) + TIME_CHARS + RANDOM_CHARS
+_DECODE = {c: i for i, c in enumerate(ALPHABET)}
+
+_lock = threading.Lock()
+_last_ms = -1
+_last_random = 0
+
+
+def _encode(value, width):
+    chars = []
+    for _ in range(width):
+        value, digit = divmod(value, 32)
+        chars.append(ALPHABET[digit])
+    return ''.join(reversed(chars))
+
+
+def new_request_id():
+    global _last_ms, _last_random
+    with _lock:
+        ms = time.time_ns() // 1_000_000
+        if ms > _last_ms:
+            _last_ms, _last_random = ms, secrets.randbits(80)
+        elif _last_random + 1 < 1 << 80:
+            _last_random += 1  # Same millisecond (or the clock stepped back): stay monotonic.
+        else:
+            _last_ms, _last_random = _last_ms + 1, secrets.randbits(79)
+        return PREFIX + _encode(_last_ms, TIME_CHARS) + _encode(_last_random, RANDOM_CHARS)
+
+
+def normalize_request_id(request_id):
+    # Base32 is case-insensitive, and IDs often come back through lower-cased queries or pasted in upper case.
+    return request_id.strip().lower()
+
+
+def is_time_ordered(request_id):
+    return (len(request_id) == ID_LENGTH and request_id.startswith(PREFIX)
+            and all(c in _DECODE for c in request_id[len(PREFIX):]))
+
+
+def created_at(request_id):
+    """When a time-ordered ID was minted (UTC), or ``None`` for a legacy ID."""
+    if not is_time_ordered(request_id):
+        return None
+    ms = 0
+    for c in request_id[len(PREFIX):len(PREFIX) + TIME_CHARS]:
+        ms = ms * 32 + _DECODE[c]
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc)
+
+
+def time_floor(moment):
+    """The smallest ID that could have been minted at ``moment`` (naive datetimes are UTC)."""
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    ms = max(0, int(moment.timestamp() * 1000))
+    return PREFIX + _encode(ms, TIME_CHARS) + ALPHABET[0] * RANDOM_CHARS
@@ -0,0 +1,300 @@
+"""SQLite storage for the leave store.
+
+Users, balances and leave requests live in one WAL-mode database, so readers
+never block the single writer and several uvicorn workers can share the data.
+Every store transaction is one ``BEGIN IMMEDIATE`` ... ``COMMIT``.
+
+One-shot migration from the JSON files::
+
+    python -m api.sqlite_store migrate
+"""
+import json
+import os
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager
+
+from api.observability import store_io
+from api.request_ids import ID_LENGTH, time_floor
+from api.store import DATA_DIR, read_json_db, USERS_DB_PATH, LEAVE_REQUESTS_DB_PATH
+
+SQLITE_DB_PATH = os.path.join(DATA_DIR, 'leave.db')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    role TEXT NOT NULL DEFAULT 'employee',
+    team TEXT
+);
+CREATE TABLE IF NOT EXISTS leave_balances (
+    user_id TEXT NOT NULL REFERENCES users(user_id),
+    leave_type TEXT NOT NULL,
+    balance INTEGER NOT NULL,
+    PRIMARY KEY (user_id, leave_type)
+);
+CREATE TABLE IF NOT EXISTS leave_requests (
+    request_id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    leave_type TEXT NOT NULL,
+    start_date TEXT NOT NULL,
+    number_of_days INTEGER NOT NULL,
+    reason TEXT NOT NULL,
+    status TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_leave_requests_user_id ON leave_requests(user_id);
+CREATE INDEX IF NOT EXISTS idx_leave_requests_status ON leave_requests(status);
+CREATE INDEX IF NOT EXISTS idx_leave_requests_start_date ON leave_requests(start_date);
+CREATE INDEX IF NOT EXISTS idx_leave_requests_number_of_days ON leave_requests(number_of_days);
+"""
+
+REQUEST_COLUMNS = "request_id, user_id, leave_type, start_date, number_of_days, reason, status"
+
+
+class SqliteLeaveStore:
+    """Same interface as ``api.store.LeaveStore``, backed by SQLite in WAL mode."""
+
+    def __init__(self, db_path=SQLITE_DB_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        if 'team' not in {c['name'] for c in conn.execute("PRAGMA table_info(users)")}:
+            conn.execute("ALTER TABLE users ADD COLUMN team TEXT")
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+            self._local.depth = 0
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        conn = self._connect()
+        if self._local.depth == 0:
+            # IMMEDIATE takes the write lock up front so check-then-update never deadlocks on upgrade.
+            conn.execute("BEGIN IMMEDIATE")
+        self._local.depth += 1
+        try:
+            yield self
+        except BaseException:
+            if self._local.depth == 1:
+                conn.execute("ROLLBACK")
+            raise
+        else:
+            if self._local.depth == 1:
+                with store_io("commit", self.db_path):
+                    conn.execute("COMMIT")
+        finally:
+            self._local.depth -= 1
+
+    # Reads
+
+    def get_user(self, user_id):
+        conn = self._connect()
+        row = conn.execute("SELECT user_id, name, role, team FROM users WHERE user_id = ?", (user_id,)).fetchone()
+        if row is None:
+            return None
+        user = {k: v for k, v in dict(row).items() if v is not None}
+        balances = conn.execute(
+            "SELECT leave_type, balance FROM leave_balances WHERE user_id = ? ORDER BY rowid", (user_id,)
+        ).fetchall()
+        return {**user, 'leave_balances': {b['leave_type']: b['balance'] for b in balances}}
+
+    def user_profiles(self, user_ids):
+        rows = self._connect().execute(
+            "SELECT user_id, name, role, team FROM users WHERE user_id IN (SELECT value FROM json_each(?))",
+            (json.dumps(list(set(user_ids))),),
+        )
+        return {row['user_id']: (row['name'], row['role'], row['team']) for row in rows}
+
+    def all_users(self):
+        conn = self._connect()
+        users = {row['user_id']: {**{k: v for k, v in dict(row).items() if v is not None}, 'leave_balances': {}}
+                 for row in conn.execute("SELECT user_id, name, role, team FROM users ORDER BY rowid")}
+        for row in conn.execute("SELECT user_id, leave_type, balance FROM leave_balances ORDER BY rowid"):
+            users[row['user_id']]['leave_balances'][row['leave_type']] = row['balance']
+        return list(users.values())
+
+    def is_manager(self, user_id):
+        row = self._connect().execute("SELECT role FROM users WHERE user_id = ?", (user_id,)).fetchone()
+        return row is not None and row['role'] == 'manager'
+
+    def get_request(self, request_id):
+        row = self._connect().execute(
+            f"SELECT {REQUEST_COLUMNS} FROM leave_requests WHERE request_id = ?", (request_id,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def requests_for_user(self, user_id):
+        rows = self._connect().execute(
+            f"SELECT {REQUEST_COLUMNS} FROM leave_requests WHERE user_id = ? ORDER BY rowid", (user_id,)
+        ).fetchall()
+        return [dict(r) for r in rows]
+
+    def requests_with_status(self, status):
+        rows = self._connect().execute(
+            f"SELECT {REQUEST_COLUMNS} FROM leave_requests WHERE status = ? ORDER BY rowid", (status,)
+        ).fetchall()
+        return [dict(r) for r in rows]
+
+    def archived_years(self):
+        # Every query here already goes through an index, so old rows do not slow the hot path.
+        return []
+
+    def archive_decided(self, before=None):
+        return {}
+
+    def page_requests(self, user_id=None, status=None, filters=None, after=None, limit=50, archived_years=()):
+        """Keyset pagination on rowid; see ``LeaveStore.page_requests``."""
+        filters = filters or {}
+        conn = self._connect()
+        clauses, params = [], []
+        for column, op, value in (
+            ("user_id", "=", user_id),
+            ("status", "=", status),
+            ("leave_type", "=", filters.get('leave_type')),
+            ("start_date", ">=", filters.get('start_from')),
+            ("start_date", "<=", filters.get('start_to')),
+        ):
+            if value:
+                clauses.append(f"{column} {op} ?")
+                params.append(value)
+        if filters.get('team'):
+            clauses.append("user_id IN (SELECT user_id FROM users WHERE team = ?)")
+            params.append(filters['team'])
+        if after is not None:
+            row = conn.execute("SELECT rowid FROM leave_requests WHERE request_id = ?", (after,)).fetchone()
+            if row is None:
+                raise ValueError(f"Invalid cursor '{after}'.")
+            clauses.append("rowid > ?")
+            params.append(row[0])
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = conn.execute(
+            f"SELECT {REQUEST_COLUMNS} FROM leave_requests {where} ORDER BY rowid LIMIT ?", (*params, limit + 1)
+        ).fetchall()
+        page = [dict(r) for r in rows[:limit]]
+        return page, (page[-1]['request_id'] if len(rows) > limit else None)
+
+    def requests_overlapping(self, start, end, user_id=None, team=None):
+        """See ``LeaveStore.requests_overlapping``. Overlapping requests start at most the longest
+        leave before ``start``, so this is a start_date index range plus a MAX off its own index."""
+        clauses, params = [], []
+        if user_id is not None:
+            clauses.append("AND user_id = ?")
+            params.append(user_id)
+        if team is not None:
+            clauses.append("AND user_id IN (SELECT user_id FROM users WHERE team = ?)")
+            params.append(team)
+        rows = self._connect().execute(
+            f"SELECT {REQUEST_COLUMNS} FROM leave_requests "
+            "WHERE start_date > date(?, '-' || (SELECT MAX(number_of_days) FROM leave_requests) || ' days') "
+            "AND start_date <= ? AND date(start_date, '+' || number_of_days || ' days') > ? "
+            f"AND status IN ('pending', 'approved') {' '.join(clauses)} ORDER BY start_date, rowid",
+            (start, end, start, *params),
+        ).fetchall()
+        return [dict(r) for r in rows]
+
+    def requests_created_between(self, since, until=None, after=None, limit=50):
+        """See ``LeaveStore.requests_created_between``; a range scan of the primary key."""
+        clauses, params = ["request_id >= ?", f"length(request_id) = {ID_LENGTH}"], [time_floor(since)]
+        if until is not None:
+            clauses.append("request_id < ?")
+            params.append(time_floor(until))
+        if after is not None:
+            clauses.append("request_id > ?")
+            params.append(after)
+        rows = self._connect().execute(
+            f"SELECT {REQUEST_COLUMNS} FROM leave_requests WHERE {' AND '.join(clauses)} ORDER BY request_id LIMIT ?",
+            (*params, limit + 1),
+        ).fetchall()
+        page = [dict(r) for r in rows[:limit]]
+        return page, (page[-1]['request_id'] if len(rows) > limit else None)
+
+    # Writes
+
+    def adjust_balance(self, user_id, leave_type, delta):
+        with self.transaction():
+            conn = self._connect()
+            conn.execute(
+                "UPDATE leave_balances SET balance = balance + ? WHERE user_id = ? AND leave_type = ?",
+                (delta, user_id, leave_type),
+            )
+            row = conn.execute(
+                "SELECT balance FROM leave_balances WHERE user_id = ? AND leave_type = ?", (user_id, leave_type)
+            ).fetchone()
+            return row['balance']
+
+    def set_balances(self, balances):
+        with self.transaction():
+            self._connect().executemany(
+                "UPDATE leave_balances SET balance = ? WHERE user_id = ? AND leave_type = ?",
+                [(b, user_id, t) for user_id, types in balances.items() for t, b in types.items()],
+            )
+
+    def upsert_users(self, users):
+        with self.transaction():
+            conn = self._connect()
+            conn.executemany(
+                "INSERT INTO users (user_id, name, role, team) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET name = excluded.name, role = excluded.role, team = excluded.team",
+                [(u['user_id'], u['name'], u['role'], u.get('team')) for u in users],
+            )
+            conn.executemany(
+                "INSERT INTO leave_balances (user_id, leave_type, balance) VALUES (?, ?, ?) "
+                "ON CONFLICT(user_id, leave_type) DO UPDATE SET balance = excluded.balance",
+                [(u['user_id'], t, b) for u in users for t, b in u['leave_balances'].items()],
+            )
+
+    def insert_request(self, request):
+        with self.transaction():
+            conn = self._connect()
+            conn.execute(
+                f"INSERT INTO leave_requests ({REQUEST_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                tuple(request[c] for c in REQUEST_COLUMNS.split(', ')),
+            )
+
+    def set_request_status(self, request_id, status):
+        with self.transaction():
+            conn = self._connect()
+            conn.execute("UPDATE leave_requests SET status = ? WHERE request_id = ?", (status, request_id))
+
+    # Migration
+
+    def is_empty(self):
+        return self._connect().execute("SELECT 1 FROM users LIMIT 1").fetchone() is None
+
+    def migrate_from_json(self, users_path=USERS_DB_PATH, requests_path=LEAVE_REQUESTS_DB_PATH):
+        users = read_json_db(users_path)
+        leave_requests = read_json_db(requests_path)
+        with self.transaction():
+            conn = self._connect()
+            conn.executemany(
+                "INSERT INTO users (user_id, name, role, team) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET name = excluded.name, role = excluded.role, team = excluded.team",
+                [(u['user_id'], u['name'], u.get('role', 'employee'), u.get('team')) for u in users],
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO leave_balances (user_id, leave_type, balance) VALUES (?, ?, ?)",
+                [(u['user_id'], t, b) for u in users for t, b in u['leave_balances'].items()],
+            )
+            conn.executemany(
+                f"INSERT OR REPLACE INTO leave_requests ({REQUEST_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [tuple(r[c] for c in REQUEST_COLUMNS.split(', ')) for r in leave_requests],
+            )
+        return len(users), len(leave_requests)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["migrate"]:
+        sys.exit("usage: python -m api.sqlite_store migrate")
+    db_path = os.environ.get("LEAVE_SQLITE_PATH", SQLITE_DB_PATH)
+    n_users, n_requests = SqliteLeaveStore(db_path).migrate_from_json()
+    print(f"Migrated {n_users} users and {n_requests} leave requests into {db_path}")
@@ -0,0 +1,746 @@
+"""Process-wide indexed view of users.json and leave_requests.json.
+
+The files are parsed once: users into a dict, requests into a compact
+``RequestTable`` plus indexes over it. A cheap mtime check on every access
+picks up edits made outside the process. ``LEAVE_STORE_BACKEND``
+selects how the data is persisted: ``json`` (default) rewrites the files,
+``journal`` appends to a journal instead (see ``api.journal_store``) and
+``sqlite`` keeps everything in a WAL-mode database (see ``api.sqlite_store``).
+``LEAVE_DATA_DIR`` points every backend at another data directory, e.g. a
+synthetic data set from ``bench.gen_data``.
+
+leave_requests.json is the hot segment: pending requests and everything
+still running this year. Decided requests that ended before it are moved by
+the archiver into immutable per-year files (by start year) under
+``archive/``, which are only read when a history query or an export asks for
+them::
+
+    python -m api.store archive --before 2026-01-01
+"""
+import asyncio
+import bisect
+import contextvars
+import functools
+import itertools
+import json
+import os
+import re
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import date
+
+from api.observability import observe_store_io
+from api.records import LEAVE_TYPES, STATUSES, USER_IDS, RequestTable, to_iso, to_ordinal
+from api.request_ids import is_time_ordered, time_floor
+
+try:
+    import fcntl
+except ImportError:  # No flock on Windows: keep to one process per data directory there.
+    fcntl = None
+
+DATA_DIR = os.environ.get("LEAVE_DATA_DIR") or os.path.join(os.path.dirname(__file__), '..', 'data')
+USERS_DB_PATH = os.path.join(DATA_DIR, 'users.json')
+LEAVE_REQUESTS_DB_PATH = os.path.join(DATA_DIR, 'leave_requests.json')
+
+# Requests that hold days on the calendar; rejected ones free them again.
+ACTIVE_STATUSES = ('pending', 'approved')
+DECIDED_STATUSES = ('approved', 'rejected')
+ARCHIVE_CACHE_SEGMENTS = int(os.environ.get("LEAVE_ARCHIVE_SEGMENTS", "2"))
+# Store operations that change users.json rather than leave_requests.json.
+USER_OPS = ('adjust_balance', 'set_balances', 'upsert_users')
+WRITE_CHUNK_SIZE = 10000
+_SPACE = re.compile(r'\s*')
+
+
+class StoreLockedError(RuntimeError):
+    """Another process holds the data directory's lock."""
+
+
+def lock_file(path, blocking=True):
+    """Open ``path`` and take an exclusive ``flock`` on it, held until the file is closed.
+
+    Without ``blocking``, raises ``StoreLockedError`` instead of waiting for another process.
+    """
+    f = open(path, 'a')
+    if fcntl is not None:
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            f.close()
+            raise StoreLockedError(f"{path} is held by another process (is the server running?); "
+                                   "stop it or make the change through the server.") from None
+    return f
+
+
+def read_json_db(path):
+    if not os.path.exists(path):
+        return []
+    started = time.perf_counter()
+    with open(path, 'r') as f:
+        data = json.load(f)
+        observe_store_io("read", path, started, f.tell())
+    return data
+
+
+def iter_json_db(path):
+    """The records of a JSON array file, decoded one at a time.
+
+    Each record's dict is garbage as soon as the caller has copied what it keeps
+    into a ``RequestTable``, so the parsed file is never in memory all at once.
+    """
+    if not os.path.exists(path):
+        return
+    started = time.perf_counter()
+    with open(path, 'r') as f:
+        text = f.read()
+        observe_store_io("read", path, started, f.tell())
+    decode = json.JSONDecoder().raw_decode
+    i = _SPACE.match(text).end()
+    if text[i:i + 1] != '[':
+        raise json.JSONDecodeError("Expecting '['", text, i)
+    i = _SPACE.match(text, i + 1).end()
+    if text[i:i + 1] == ']':
+        return
+    while True:
+        record, i = decode(text, i)
+        yield record
+        i = _SPACE.match(text, i).end()
+        if text[i:i + 1] == ']':
+            return
+        if text[i:i + 1] != ',':
+            raise json.JSONDecodeError("Expecting ',' delimiter", text, i)
+        i = _SPACE.match(text, i + 1).end()
+
+
+def write_json_db(path, records):
+    # Write next to the target and rename over it so a crash never leaves a truncated file.
+    # ``records`` may be a generator over a RequestTable: it is encoded a chunk at a time, and
+    # the bytes are the same as json.dump(list(records), f, indent=2).
+    started = time.perf_counter()
+    tmp_path = f"{path}.tmp"
+    encoder = json.JSONEncoder(indent=2)
+    records = iter(records)
+    with open(tmp_path, 'w') as f:
+        opening = '['
+        while chunk := list(itertools.islice(records, WRITE_CHUNK_SIZE)):
+            f.write(opening + encoder.encode(chunk)[1:-2])  # Without the chunk's own "[" and "\n]".
+            opening = ','
+        f.write('[]' if opening == '[' else '\n]')
+        f.flush()
+        os.fsync(f.fileno())
+        nbytes = f.tell()
+    os.replace(tmp_path, path)
+    observe_store_io("write", path, started, nbytes)
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def _copy_user(user):
+    return {**user, 'leave_balances': dict(user['leave_balances'])}
+
+
+def _remove_sorted(seqs, seq):
+    i = bisect.bisect_left(seqs, seq)
+    if i < len(seqs) and seqs[i] == seq:
+        del seqs[i]
+
+
+class IntervalIndex:
+    """Rows of a ``RequestTable``, found by the days ``[start, start + days)`` they cover.
+
+    Rows are kept sorted by first day, in two parallel arrays. Anything
+    overlapping ``[first, end)`` must start in ``[first - longest + 1, end)``,
+    so a query is one bisect plus a scan of that slice. ``longest`` only grows;
+    leaves are short, so the slice holds little beyond the k hits and a query
+    costs O(log n + k).
+    """
+
+    __slots__ = ('_table', '_firsts', '_rows', '_longest')
+
+    def __init__(self, table, rows=()):
+        self._table = table
+        rows = sorted(rows, key=table.starts.__getitem__)  # Stable: equal starts stay in row order.
+        self._firsts = array('i', (table.starts[r] for r in rows))
+        self._rows = array('I', rows)
+        self._longest = max((table.days[r] for r in rows), default=0)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _find(self, row):
+        first = self._table.starts[row]
+        lo = bisect.bisect_left(self._firsts, first)
+        hi = bisect.bisect_right(self._firsts, first, lo)
+        return first, bisect.bisect_left(self._rows, row, lo, hi), hi
+
+    def add(self, row):
+        first, i, _ = self._find(row)
+        self._firsts.insert(i, first)
+        self._rows.insert(i, row)
+        self._longest = max(self._longest, self._table.days[row])
+
+    def discard(self, row):
+        _, i, hi = self._find(row)
+        if i < hi and self._rows[i] == row:
+            del self._firsts[i]
+            del self._rows[i]
+
+    def overlapping(self, first, end):
+        lo = bisect.bisect_left(self._firsts, first - self._longest + 1)
+        hi = bisect.bisect_left(self._firsts, end, lo)
+        starts, days = self._table.starts, self._table.days
+        return [r for r in self._rows[lo:hi] if starts[r] + days[r] > first]
+
+
+class ArchiveSegment:
+    def __init__(self, requests):
+        self.table = RequestTable(requests)
+        self.user_positions = {}
+        for i, user in enumerate(self.table.users):
+            self.user_positions.setdefault(user, array('I')).append(i)
+
+
+class ArchiveSegments:
+    """Per-year files of decided requests, keyed by start year and loaded on first use.
+
+    Only the archiver writes them, and only to add records; the few most
+    recently read segments stay cached until their file changes.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._cache = OrderedDict()
+
+    def path(self, year):
+        return os.path.join(self.directory, f'leave_requests_{year}.json')
+
+    def years(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(int(name[15:-5]) for name in os.listdir(self.directory)
+                      if name.startswith('leave_requests_') and name.endswith('.json'))
+
+    def load(self, year):
+        mtime = _mtime(self.path(year))
+        if year in self._cache and self._cache[year][0] == mtime:
+            self._cache.move_to_end(year)
+            return self._cache[year][1]
+        segment = ArchiveSegment(iter_json_db(self.path(year)))
+        self._cache[year] = (mtime, segment)
+        self._cache.move_to_end(year)
+        while len(self._cache) > ARCHIVE_CACHE_SEGMENTS:
+            self._cache.popitem(last=False)
+        return segment
+
+    def append(self, year, requests):
+        # Rewritten whole and renamed into place; a retried run skips what is already there.
+        existing = self.load(year)
+        added = [r for r in requests if r['request_id'] not in existing.table.row_of]
+        if added:
+            os.makedirs(self.directory, exist_ok=True)
+            write_json_db(self.path(year), itertools.chain(existing.table.rows(), added))
+            self._cache.pop(year, None)
+
+
+class LeaveStore:
+    """Users indexed by ``user_id``; requests by ``request_id``, requester and status.
+
+    Requests live in a ``RequestTable`` (see ``api.records``), and a request's
+    sequence number is its load-order row there. The requester and status
+    indexes are sorted arrays of those numbers, so a page after a cursor is one
+    bisect plus a slice. Pending and approved requests are also kept in
+    ``IntervalIndex``es, one store-wide and one per requester, for calendar
+    and overlap queries. Time-ordered request IDs (see ``api.request_ids``)
+    are also kept in one sorted list, so "created since T" is a range of it.
+    Reads return new dicts, built from the table. Mutations must happen inside
+    ``transaction()``, which holds the store lock and writes each touched file
+    once when the outermost block exits.
+    """
+
+    def __init__(self, users_path=USERS_DB_PATH, requests_path=LEAVE_REQUESTS_DB_PATH):
+        self.users_path = users_path
+        self.requests_path = requests_path
+        self.lock = threading.RLock()
+        self.lock_path = os.path.join(os.path.dirname(os.path.abspath(users_path)), 'store.lock')
+        self._lock_file = None
+        self._depth = 0
+        self._dirty = set()
+        self._mtimes = {}
+        self._users_by_id = {}
+        self._requests = RequestTable()
+        self._user_seqs = {}
+        self._status_seqs = {}
+        self._active_spans = IntervalIndex(self._requests)
+        self._user_spans = {}
+        self._created_ids = []
+        self.archive = ArchiveSegments(os.path.join(os.path.dirname(requests_path), 'archive'))
+        self._archiver = None
+        self._stop_archiver = threading.Event()
+
+    # Loading
+
+    def _refresh(self):
+        for path, read, load in ((self.users_path, read_json_db, self._load_users),
+                                 (self.requests_path, iter_json_db, self._load_requests)):
+            mtime = _mtime(path)
+            if path not in self._mtimes or self._mtimes[path] != mtime:
+                load(read(path))
+                self._mtimes[path] = mtime
+
+    def _load_users(self, users):
+        self._users_by_id = {u['user_id']: u for u in users}
+
+    def _load_requests(self, leave_requests):
+        self._requests = RequestTable()
+        self._user_seqs = {}
+        self._status_seqs = {}
+        self._created_ids = []
+        for req in leave_requests:
+            self._index_request(req, spans=False)
+        # Sort the interval indexes once rather than inserting into them one request at a time.
+        table = self._requests
+        active = {STATUSES.code(status) for status in ACTIVE_STATUSES}
+        seqs = [seq for seq, status in enumerate(table.statuses) if status in active]
+        self._active_spans = IntervalIndex(table, seqs)
+        by_user = {}
+        for seq in seqs:
+            by_user.setdefault(table.users[seq], []).append(seq)
+        self._user_spans = {user: IntervalIndex(table, s) for user, s in by_user.items()}
+
+    def _add_span(self, seq):
+        self._active_spans.add(seq)
+        user = self._requests.users[seq]
+        if user not in self._user_spans:
+            self._user_spans[user] = IntervalIndex(self._requests)
+        self._user_spans[user].add(seq)
+
+    def _discard_span(self, seq):
+        self._active_spans.discard(seq)
+        if self._requests.users[seq] in self._user_spans:
+            self._user_spans[self._requests.users[seq]].discard(seq)
+
+    def _index_request(self, req, spans=True):
+        request_id = req['request_id']
+        seq = self._requests.append(req)
+        self._user_seqs.setdefault(self._requests.users[seq], array('I')).append(seq)
+        self._status_seqs.setdefault(self._requests.statuses[seq], array('I')).append(seq)
+        if spans and req['status'] in ACTIVE_STATUSES:
+            self._add_span(seq)
+        if is_time_ordered(request_id):
+            if not self._created_ids or request_id > self._created_ids[-1]:
+                self._created_ids.append(request_id)
+            else:
+                bisect.insort(self._created_ids, request_id)
+
+    def _apply(self, record):
+        op = record['op']
+        if op == 'adjust_balance':
+            self._users_by_id[record['user_id']]['leave_balances'][record['leave_type']] += record['delta']
+        elif op == 'set_balances':
+            for user_id, balances in record['balances'].items():
+                self._users_by_id[user_id]['leave_balances'].update(balances)
+        elif op == 'archive_requests':
+            archived = set(record['request_ids'])
+            self._load_requests(r for r in self._requests.rows() if r['request_id'] not in archived)
+        elif op == 'upsert_users':
+            for row in record['users']:
+                user = self._users_by_id.get(row['user_id'])
+                if user is None:
+                    self._users_by_id[row['user_id']] = _copy_user(row)
+                else:
+                    user.update({k: v for k, v in row.items() if k != 'leave_balances'})
+                    user['leave_balances'].update(row['leave_balances'])
+        elif op == 'insert_request':
+            self._index_request(record['request'])
+        elif op == 'set_request_status':
+            table = self._requests
+            seq = table.row_of[record['request_id']]
+            _remove_sorted(self._status_seqs[table.statuses[seq]], seq)
+            was_active = table.status(seq) in ACTIVE_STATUSES
+            table.set_status(seq, record['status'])
+            bisect.insort(self._status_seqs.setdefault(table.statuses[seq], array('I')), seq)
+            if was_active and record['status'] not in ACTIVE_STATUSES:
+                self._discard_span(seq)
+            elif not was_active and record['status'] in ACTIVE_STATUSES:
+                self._add_span(seq)
+        else:
+            raise ValueError(f"Unknown store operation '{op}'.")
+        return record
+
+    def _log(self, record):
+        self._dirty.add(self.users_path if record['op'] in USER_OPS else self.requests_path)
+
+    def _invalidate(self):
+        self._dirty.clear()
+        self._mtimes.clear()
+
+    def _flush(self):
+        if self.users_path in self._dirty:
+            write_json_db(self.users_path, list(self._users_by_id.values()))
+        if self.requests_path in self._dirty:
+            write_json_db(self.requests_path, self._requests.rows())
+        for path in self._dirty:
+            self._mtimes[path] = _mtime(path)
+        self._dirty.clear()
+
+    def _lock_files(self):
+        # Outermost transactions also flock store.lock, so another process on the same files (one
+        # of the CLIs next to the server) waits for this one instead of overwriting its writes.
+        if fcntl is not None:
+            if self._lock_file is None:
+                self._lock_file = open(self.lock_path, 'a')
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+
+    def _unlock_files(self):
+        if self._lock_file is not None:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+
+    @contextmanager
+    def transaction(self):
+        with self.lock:
+            if self._depth == 0:
+                self._lock_files()
+            try:
+                if self._depth == 0:
+                    self._refresh()
+                self._depth += 1
+                try:
+                    yield self
+                except BaseException:
+                    if self._depth == 1:
+                        # Drop half-applied in-memory changes; the next access reloads from disk.
+                        self._invalidate()
+                    raise
+                else:
+                    if self._depth == 1:
+                        self._flush()
+                finally:
+                    self._depth -= 1
+            finally:
+                if self._depth == 0:
+                    self._unlock_files()
+
+    # Reads
+
+    def get_user(self, user_id):
+        with self.transaction():
+            user = self._users_by_id.get(user_id)
+            return _copy_user(user) if user else None
+
+    def user_profiles(self, user_ids):
+        """``{user_id: (name, role, team)}`` for those of ``user_ids`` that exist, in one transaction."""
+        with self.transaction():
+            users = self._users_by_id
+            return {u: (users[u]['name'], users[u].get('role'), users[u].get('team'))
+                    for u in set(user_ids) if u in users}
+
+    def all_users(self):
+        with self.transaction():
+            return [_copy_user(u) for u in self._users_by_id.values()]
+
+    def is_manager(self, user_id):
+        user = self.get_user(user_id)
+        return user is not None and user.get('role') == 'manager'
+
+    def get_request(self, request_id):
+        with self.transaction():
+            seq = self._requests.row_of.get(request_id)
+            return self._requests.row(seq) if seq is not None else None
+
+    def requests_for_user(self, user_id):
+        with self.transaction():
+            return list(self._requests.rows(self._user_seqs.get(USER_IDS.codes.get(user_id), ())))
+
+    def requests_with_status(self, status):
+        with self.transaction():
+            return list(self._requests.rows(self._status_seqs.get(STATUSES.codes.get(status), ())))
+
+    def _row_filter(self, status, filters):
+        """A ``(table, seq)`` predicate for ``status`` and ``filters``, compared as codes and ordinals."""
+        status_code = STATUSES.codes.get(status, -1) if status is not None else None
+        leave_type = LEAVE_TYPES.codes.get(filters['leave_type'], -1) if filters.get('leave_type') else None
+        start_from = to_ordinal(filters['start_from']) if filters.get('start_from') else None
+        start_to = to_ordinal(filters['start_to']) if filters.get('start_to') else None
+        team = filters.get('team')
+        users = self._users_by_id
+
+        def keep(table, seq):
+            if status_code is not None and table.statuses[seq] != status_code:
+                return False
+            if leave_type is not None and table.leave_types[seq] != leave_type:
+                return False
+            if start_from is not None and table.starts[seq] < start_from:
+                return False
+            if start_to is not None and table.starts[seq] > start_to:
+                return False
+            if team:
+                user = users.get(table.user_id(seq))
+                if not user or user.get('team') != team:
+                    return False
+            return True
+        return keep
+
+    def archived_years(self):
+        return self.archive.years()
+
+    def page_requests(self, user_id=None, status=None, filters=None, after=None, limit=50, archived_years=()):
+        """One page of requests in insertion order, plus the cursor for the next page (or ``None``).
+
+        ``after`` is the cursor the previous page ended on: its last ``request_id``,
+        or ``<year>/<request_id>`` inside an archived year. ``filters`` may hold
+        ``leave_type``, ``start_from``/``start_to`` (ISO dates) and ``team``.
+        ``archived_years`` are read first, oldest first, then the hot segment.
+        """
+        user = USER_IDS.codes.get(user_id, -1) if user_id is not None else None
+        cursor_of = lambda req, year: req['request_id'] if year is None else f"{year}/{req['request_id']}"
+        with self.transaction():
+            keep = self._row_filter(status, filters or {})
+            page = []
+            page_year = after_year = None
+            if after is not None and '/' in after:
+                after_year, after = after.split('/', 1)
+                after_year = int(after_year) if after_year.isdigit() else None
+                if after_year not in archived_years:
+                    raise ValueError(f"Invalid cursor '{after_year}/{after}'.")
+            if after is None or after_year is not None:
+                for year in archived_years:
+                    if after_year is not None and year < after_year:
+                        continue
+                    segment = self.archive.load(year)
+                    table = segment.table
+                    positions = segment.user_positions.get(user, ()) if user is not None else range(len(table))
+                    start = 0
+                    if year == after_year:
+                        if after not in table.row_of:
+                            raise ValueError(f"Invalid cursor '{year}/{after}'.")
+                        start = bisect.bisect_right(positions, table.row_of[after])
+                    for i in range(start, len(positions)):
+                        if not keep(table, positions[i]):
+                            continue
+                        if len(page) == limit:
+                            return page, cursor_of(page[-1], page_year)
+                        page.append(table.row(positions[i]))
+                        page_year = year
+                after = None
+
+            table = self._requests
+            if user is not None:
+                seqs = self._user_seqs.get(user, ())
+            elif status is not None:
+                seqs = self._status_seqs.get(STATUSES.codes.get(status), ())
+            else:
+                seqs = range(len(table))
+            start = 0
+            if after is not None:
+                if after not in table.row_of:
+                    raise ValueError(f"Invalid cursor '{after}'.")
+                start = bisect.bisect_right(seqs, table.row_of[after])
+
+            for i in range(start, len(seqs)):
+                if not keep(table, seqs[i]):
+                    continue
+                if len(page) == limit:
+                    return page, cursor_of(page[-1], page_year)
+                page.append(table.row(seqs[i]))
+                page_year = None
+            return page, None
+
+    def requests_overlapping(self, start, end, user_id=None, team=None):
+        """Pending and approved requests covering any day in ``[start, end]`` (ISO dates, inclusive),
+        ordered by start date. ``user_id`` or ``team`` narrows them to one requester or team."""
+        first, last = date.fromisoformat(start).toordinal(), date.fromisoformat(end).toordinal()
+        with self.transaction():
+            if user_id is not None:
+                index = self._user_spans.get(USER_IDS.codes.get(user_id))
+                seqs = index.overlapping(first, last + 1) if index else []
+            else:
+                seqs = self._active_spans.overlapping(first, last + 1)
+            table = self._requests
+            found = []
+            for seq in seqs:
+                if team is not None:
+                    user = self._users_by_id.get(table.user_id(seq))
+                    if not user or user.get('team') != team:
+                        continue
+                found.append(table.row(seq))
+            return found
+
+    def requests_created_between(self, since, until=None, after=None, limit=50):
+        """Requests with time-ordered IDs minted in ``[since, until)``, oldest first, plus the cursor
+        for the next page. Legacy IDs carry no time and are never included."""
+        with self.transaction():
+            ids = self._created_ids
+            start = bisect.bisect_left(ids, time_floor(since))
+            if after is not None:
+                start = max(start, bisect.bisect_right(ids, after))
+            end = bisect.bisect_left(ids, time_floor(until)) if until is not None else len(ids)
+            page = [self._requests.row(self._requests.row_of[i]) for i in ids[start:min(end, start + limit)]]
+            return page, (page[-1]['request_id'] if start + limit < end else None)
+
+    # Writes
+
+    def adjust_balance(self, user_id, leave_type, delta):
+        with self.transaction():
+            self._log(self._apply({'op': 'adjust_balance', 'user_id': user_id, 'leave_type': leave_type, 'delta': delta}))
+            return self._users_by_id[user_id]['leave_balances'][leave_type]
+
+    def set_balances(self, balances):
+        """Overwrite many balances as one logged change: ``{user_id: {leave_type: balance}}``."""
+        with self.transaction():
+            self._log(self._apply({'op': 'set_balances', 'balances': balances}))
+
+    def upsert_users(self, users):
+        """Insert or update many users as one logged change. Each row carries ``user_id``, ``name``
+        and ``role``, plus optionally ``team`` and the ``leave_balances`` to overwrite."""
+        with self.transaction():
+            self._log(self._apply({'op': 'upsert_users', 'users': users}))
+
+    def insert_request(self, request):
+        with self.transaction():
+            if request['request_id'] in self._requests.row_of:
+                raise ValueError(f"Leave request '{request['request_id']}' already exists.")
+            self._log(self._apply({'op': 'insert_request', 'request': dict(request)}))
+
+    def set_request_status(self, request_id, status):
+        with self.transaction():
+            self._log(self._apply({'op': 'set_request_status', 'request_id': request_id, 'status': status}))
+
+
+    # Archiving
+
+    def archive_decided(self, before=None):
+        """Move approved and rejected requests that ended before ``before`` (ISO date; default: this
+        year's January 1st, never later than today) into the per-year archive. Returns ``{year: moved}``.
+
+        A leave still running on ``before`` stays hot: calendars and overlap checks only see the hot segment.
+        """
+        before = to_ordinal(before or date(date.today().year, 1, 1).isoformat())
+        if before > date.today().toordinal():
+            raise ValueError(f"Cannot archive up to {to_iso(before)}: that is later than today.")
+        with self.transaction():
+            table = self._requests
+            decided = {STATUSES.code(status) for status in DECIDED_STATUSES}
+            by_year = {}
+            for seq, (status, start, days) in enumerate(zip(table.statuses, table.starts, table.days)):
+                if status in decided and start + days <= before:
+                    by_year.setdefault(date.fromordinal(start).year, []).append(table.row(seq))
+            if not by_year:
+                return {}
+            # Segments first: after a crash here the records are in both places, and the next run
+            # finds them already archived and only drops them from the hot segment.
+            for year, requests in sorted(by_year.items()):
+                self.archive.append(year, requests)
+            self._log(self._apply({'op': 'archive_requests', 'request_ids': [
+                r['request_id'] for requests in by_year.values() for r in requests]}))
+            return {year: len(requests) for year, requests in sorted(by_year.items())}
+
+    def start_archiver(self, interval=None):
+        interval = interval or float(os.environ.get("LEAVE_ARCHIVE_INTERVAL", "86400"))
+
+        def run():
+            while not self._stop_archiver.wait(interval):
+                try:
+                    moved = self.archive_decided()
+                    if moved:
+                        print(f"Archived decided leave requests: {moved}")
+                except Exception as e:
+                    print(f"Archiving failed: {e}")
+
+        self._archiver = threading.Thread(target=run, name="leave-archiver", daemon=True)
+        self._archiver.start()
+
+    def stop_archiver(self):
+        self._stop_archiver.set()
+        if self._archiver is not None:
+            self._archiver.join()
+            self._archiver = None
+
+def create_store(backend):
+    if backend in ("json", "journal"):
+        if backend == "json":
+            store = LeaveStore()
+        else:
+            from api.journal_store import JournalLeaveStore
+            store = JournalLeaveStore()
+            store.claim()
+            store.start_compactor()
+        if os.environ.get("LEAVE_ARCHIVE_INTERVAL") != "0":
+            store.start_archiver()
+        return store
+    if backend == "sqlite":
+        from api.sqlite_store import SqliteLeaveStore, SQLITE_DB_PATH
+        store = SqliteLeaveStore(os.environ.get("LEAVE_SQLITE_PATH", SQLITE_DB_PATH))
+        if store.is_empty():
+            store.migrate_from_json()
+        return store
+    raise ValueError(f"Unknown LEAVE_STORE_BACKEND '{backend}'.")
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = create_store(os.environ.get("LEAVE_STORE_BACKEND", "json"))
+    return _store
+
+
+# Store calls block on the lock, the disk or SQLite. Async callers hand them to this
+# bounded pool so the event loop never waits on them, and a burst of writes queues
+# here instead of taking every thread the loop has.
+STORE_EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("STORE_EXECUTOR_WORKERS", "8")),
+    thread_name_prefix="leave-store",
+)
+
+
+async def run_blocking(fn, *args, **kwargs):
+    """Run ``fn`` on ``STORE_EXECUTOR``, keeping the caller's context (and so its trace)."""
+    call = functools.partial(contextvars.copy_context().run, fn, *args, **kwargs)
+    return await asyncio.get_running_loop().run_in_executor(STORE_EXECUTOR, call)
+
+
+def to_async(fn):
+    """Async twin of a blocking store-backed function, run through ``run_blocking``."""
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        return await run_blocking(fn, *args, **kwargs)
+    return wrapper
+
+
+async def aiter_blocking(iterator):
+    """Drive a blocking iterator from async code, one ``run_blocking`` call per item."""
+    done = object()
+    while (item := await run_blocking(next, iterator, done)) is not done:
+        yield item
+
+
+if __name__ == "__main__":
+    import argparse
+
+    import api.store as api_store  # This file runs as __main__; the journal store raises api.store's errors.
+
+    parser = argparse.ArgumentParser(description="Move decided leave requests into the per-year archive.")
+    parser.add_argument("command", choices=["archive"])
+    parser.add_argument("--before", type=date.fromisoformat,
+                        help="Archive decided requests that ended before this date (default: January 1st).")
+    args = parser.parse_args()
+    try:
+        store = create_store(os.environ.get("LEAVE_STORE_BACKEND", "json"))
+        moved = store.archive_decided(args.before.isoformat() if args.before else None)
+    except (ValueError, StoreLockedError, api_store.StoreLockedError) as e:
+        parser.exit(1, f"{e}\n")
+    print(f"Archived {sum(moved.values())} leave requests" + (f" ({moved})" if moved else ""))
@@ -1,25 +1,15 @@
 
-import json
-import os
-from datetime import date
+from datetime import date, datetime, timedelta
 from pydantic import BaseModel, Field
-import uuid
-from typing import Literal
+from typing import Literal, Optional
 
-DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'data')
-USERS_DB_PATH = os.path.join(DATA_DIR, 'users.json')
-LEAVE_REQUESTS_DB_PATH = os.path.join(DATA_DIR, 'leave_requests.json')
-
-def read_json_db(path):
-    if not os.path.exists(path):
-        return []
-    with open(path, 'r') as f:
-        return json.load(f)
-
-def write_json_db(path, data):
-    with open(path, 'w') as f:
-        json.dump(data, f, indent=2)
+from api.request_ids import new_request_id, normalize_request_id
+from api.store import get_store, to_async
 
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+MAX_CALENDAR_DAYS = 366
+REQUEST_FIELDS = ("request_id", "user_id", "leave_type", "start_date", "number_of_days", "reason", "status")
 
 class LeaveBalanceInput(BaseModel):
     user_id: str = Field(description="The unique identifier of the user, e.g., 'user001'.")
@@ -28,138 +18,343 @@ class ApplyLeaveInput(BaseModel):
     user_id: str = Field(description="The unique identifier of the user applying for leave.")
     leave_type: str = Field(description="The type of leave: 'casual_leave', 'sick_leave', or 'earned_leave'.")
     start_date: date = Field(description="The start date of the leave in YYYY-MM-DD format.")
-    number_of_days: int = Field(description="The total number of days for the leave.")
+    number_of_days: int = Field(gt=0, description="The total number of days for the leave.")
     reason: str = Field(description="The reason for taking the leave.")
 
 class CheckStatusInput(BaseModel):
     user_id: str = Field(description="The unique identifier of the user checking their leave status.")
+    status: Optional[Literal['pending', 'approved', 'rejected']] = Field(default=None, description="Only requests with this status.")
+    leave_type: Optional[str] = Field(default=None, description="Only requests of this leave type, e.g., 'sick_leave'.")
+    start_from: Optional[date] = Field(default=None, description="Only requests starting on or after this date (YYYY-MM-DD).")
+    start_to: Optional[date] = Field(default=None, description="Only requests starting on or before this date (YYYY-MM-DD).")
+    cursor: Optional[str] = Field(default=None, description="The `next_cursor` returned by the previous page.")
+    limit: int = Field(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of requests to return.")
+    fields: Optional[list[str]] = Field(default=None, description="Only return these request fields (request_id is always included).")
+    include_archived: bool = Field(default=False, description="Also read decided requests from past years (listed in `archived_years`); only needed for older history.")
 
 class GetAllPendingRequestsInput(BaseModel):
     manager_id: str = Field(description="The user ID of the manager making the request, e.g., 'user001'.")
+    leave_type: Optional[str] = Field(default=None, description="Only requests of this leave type, e.g., 'sick_leave'.")
+    start_from: Optional[date] = Field(default=None, description="Only requests starting on or after this date (YYYY-MM-DD).")
+    start_to: Optional[date] = Field(default=None, description="Only requests starting on or before this date (YYYY-MM-DD).")
+    team: Optional[str] = Field(default=None, description="Only requests from employees whose user record has this team.")
+    cursor: Optional[str] = Field(default=None, description="The `next_cursor` returned by the previous page.")
+    limit: int = Field(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of requests to return.")
+    fields: Optional[list[str]] = Field(default=None, description="Only return these request fields (request_id is always included).")
 
 class ManageLeaveRequestInput(BaseModel):
     manager_id: str = Field(description="The user ID of the manager taking the action.")
     request_id: str = Field(description="The unique ID of the leave request to be managed, e.g., 'req_8949fb'.")
     action: Literal['approved', 'rejected'] = Field(description="The action to take: 'approved' or 'rejected'.")
 
+class LeaveDecision(BaseModel):
+    request_id: str = Field(description="The unique ID of the leave request, e.g., 'req_8949fb'.")
+    action: Literal['approved', 'rejected'] = Field(description="The action to take: 'approved' or 'rejected'.")
+
+class PendingRequestFilter(BaseModel):
+    leave_type: Optional[str] = Field(default=None, description="Only requests of this leave type, e.g., 'sick_leave'.")
+    start_from: Optional[date] = Field(default=None, description="Only requests starting on or after this date (YYYY-MM-DD).")
+    start_to: Optional[date] = Field(default=None, description="Only requests starting on or before this date (YYYY-MM-DD).")
+    team: Optional[str] = Field(default=None, description="Only requests from employees whose user record has this team.")
+    user_ids: Optional[list[str]] = Field(default=None, description="Only requests from these user IDs.")
+
+class ManageLeaveRequestsBulkInput(BaseModel):
+    manager_id: str = Field(description="The user ID of the manager taking the action.")
+    decisions: Optional[list[LeaveDecision]] = Field(default=None, description="Explicit (request_id, action) pairs.")
+    filter: Optional[PendingRequestFilter] = Field(default=None, description="Select pending requests by filter instead of by ID.")
+    filter_action: Optional[Literal['approved', 'rejected']] = Field(default=None, description="The action applied to every request matched by `filter`.")
+
+class GetTeamCalendarInput(BaseModel):
+    user_id: str = Field(description="The user ID of the person asking, e.g., 'user001'.")
+    start_date: date = Field(description="First day of the period in YYYY-MM-DD format.")
+    end_date: date = Field(description="Last day of the period in YYYY-MM-DD format.")
+    team: Optional[str] = Field(default=None, description="Managers only: the team to show; omit for everyone. Employees always see their own team.")
 
-def _is_manager(user_id: str, users: list) -> bool:
-    
-    for user in users:
-        if user['user_id'] == user_id:
-            return user.get('role') == 'manager'
-    return False
+
+def _as_dict(value):
+    return value.model_dump() if isinstance(value, BaseModel) else dict(value)
+
+
+def _is_manager(user_id: str) -> bool:
+    return get_store().is_manager(user_id)
 
 
 def get_leave_balance(user_id: str) -> dict:
     
-    users = read_json_db(USERS_DB_PATH)
-    for user in users:
-        if user['user_id'] == user_id:
-            return {
-                "success": True,
-                "user_name": user['name'],
-                "balances": user['leave_balances']
-            }
+    user = get_store().get_user(user_id)
+    if user:
+        return {
+            "success": True,
+            "user_name": user['name'],
+            "balances": user['leave_balances']
+        }
     return {"success": False, "error": f"User with ID '{user_id}' not found."}
 
 
 def apply_for_leave(user_id: str, leave_type: str, start_date: date, number_of_days: int, reason: str) -> dict:
     
-    users = read_json_db(USERS_DB_PATH)
-    leave_requests = read_json_db(LEAVE_REQUESTS_DB_PATH)
-
     if start_date < date.today():
         return {"success": False, "error": "Invalid start date. Cannot apply for leave in the past."}
-
-    user_found = next((u for u in users if u['user_id'] == user_id), None)
-    if not user_found:
-        return {"success": False, "error": f"User with ID '{user_id}' not found."}
+    if number_of_days <= 0:
+        return {"success": False, "error": "The number of days must be at least 1."}
+
+    store = get_store()
+    with store.transaction():
+        user_found = store.get_user(user_id)
+        if not user_found:
+            return {"success": False, "error": f"User with ID '{user_id}' not found."}
  
-    if leave_type not in user_found['leave_balances']:
-        return {"success": False, "error": f"Invalid leave type '{leave_type}'."}
-
-    if user_found['leave_balances'][leave_type] < number_of_days:
-        return {"success": False, "error": "Insufficient leave balance."}
-
-    
-    user_found['leave_balances'][leave_type] -= number_of_days
-    write_json_db(USERS_DB_PATH, users)
-
-    new_request = {
-        "request_id": f"req_{uuid.uuid4().hex[:6]}",
-        "user_id": user_id,
-        "leave_type": leave_type,
-        "start_date": start_date.isoformat(),
-        "number_of_days": number_of_days,
-        "reason": reason,
-        "status": "pending"
-    }
-    leave_requests.append(new_request)
-    write_json_db(LEAVE_REQUESTS_DB_PATH, leave_requests)
+        if leave_type not in user_found['leave_balances']:
+            return {"success": False, "error": f"Invalid leave type '{leave_type}'."}
+
+        if user_found['leave_balances'][leave_type] < number_of_days:
+            return {"success": False, "error": "Insufficient leave balance."}
+
+        last_day = start_date + timedelta(days=number_of_days - 1)
+        clashes = store.requests_overlapping(start_date.isoformat(), last_day.isoformat(), user_id=user_id)
+        if clashes:
+            clash = clashes[0]
+            return {"success": False, "error": f"These dates overlap your {clash['status']} leave request "
+                                               f"'{clash['request_id']}' starting {clash['start_date']}."}
+
+        new_balance = store.adjust_balance(user_id, leave_type, -number_of_days)
+
+        request_id = new_request_id()
+        while store.get_request(request_id):
+            request_id = new_request_id()
+
+        new_request = {
+            "request_id": request_id,
+            "user_id": user_id,
+            "leave_type": leave_type,
+            "start_date": start_date.isoformat(),
+            "number_of_days": number_of_days,
+            "reason": reason,
+            "status": "pending"
+        }
+        store.insert_request(new_request)
 
     return {
         "success": True,
         "message": "Leave application submitted and is now pending approval.",
         "request_id": new_request['request_id'],
-        "new_balance": user_found['leave_balances'][leave_type]
+        "new_balance": new_balance
     }
 
 
-def check_leave_status(user_id: str) -> dict:
+def _page_of_requests(user_id=None, status=None, filters=None, cursor=None, limit=DEFAULT_PAGE_SIZE, fields=None,
+                      archived_years=()):
+    if fields:
+        unknown = set(fields) - set(REQUEST_FIELDS)
+        if unknown:
+            return {"success": False, "error": f"Unknown request fields: {', '.join(sorted(unknown))}."}
+    filters = {k: (v.isoformat() if isinstance(v, date) else v) for k, v in (filters or {}).items() if v}
+    limit = max(1, min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE))
+    try:
+        page, next_cursor = get_store().page_requests(user_id, status, filters, cursor, limit, archived_years)
+    except ValueError as e:
+        return {"success": False, "error": str(e)}
+    if fields:
+        keep = ["request_id", *(f for f in fields if f != "request_id")]
+        page = [{f: r[f] for f in keep} for r in page]
+    return {"success": True, "requests": page, "next_cursor": next_cursor}
+
+
+def _archived_years_for(start_from=None, start_to=None, include_archived=False, status=None):
+    """``(read, skipped)``: the archived years in a history query's date range that it reads, and
+    those it leaves out. Only ``include_archived`` or a ``start_from`` inside them reads them."""
+    if status == 'pending':
+        return [], []  # Pending requests are never archived.
+    years = [y for y in get_store().archived_years()
+             if (start_from is None or y >= start_from.year) and (start_to is None or y <= start_to.year)]
+    if include_archived or start_from is not None:
+        return years, []
+    return [], years
+
+
+def check_leave_status(user_id: str, status: Optional[str] = None, leave_type: Optional[str] = None,
+                       start_from: Optional[date] = None, start_to: Optional[date] = None,
+                       cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE,
+                       fields: Optional[list] = None, include_archived: bool = False) -> dict:
     
-    leave_requests = read_json_db(LEAVE_REQUESTS_DB_PATH)
-    user_requests = [req for req in leave_requests if req['user_id'] == user_id]
-    if not user_requests:
-        return {"success": True, "requests": [], "message": f"No leave requests found for user '{user_id}'."}
-    return {"success": True, "requests": user_requests}
-
-
-def get_all_pending_requests(manager_id: str) -> dict:
+    years, skipped = _archived_years_for(start_from, start_to, include_archived, status)
+    result = _page_of_requests(user_id=user_id, status=status, cursor=cursor, limit=limit, fields=fields,
+                               filters={"leave_type": leave_type, "start_from": start_from, "start_to": start_to},
+                               archived_years=years)
+    if result["success"] and skipped:
+        result["archived_years"] = skipped
+    if result["success"] and not result["requests"] and cursor is None:
+        result["message"] = f"No leave requests found for user '{user_id}'."
+    return result
+
+
+def get_all_pending_requests(manager_id: str, leave_type: Optional[str] = None,
+                             start_from: Optional[date] = None, start_to: Optional[date] = None,
+                             team: Optional[str] = None, cursor: Optional[str] = None,
+                             limit: int = DEFAULT_PAGE_SIZE, fields: Optional[list] = None) -> dict:
     
-    users = read_json_db(USERS_DB_PATH)
-    if not _is_manager(manager_id, users):
+    if not _is_manager(manager_id):
         return {"success": False, "error": "Access denied. Only managers can view all pending requests."}
 
-    leave_requests = read_json_db(LEAVE_REQUESTS_DB_PATH)
-    pending_requests = [req for req in leave_requests if req['status'] == 'pending']
-
-    if not pending_requests:
-        return {"success": True, "requests": [], "message": "No pending leave requests found."}
-
-    return {"success": True, "requests": pending_requests}
+    result = _page_of_requests(status='pending', cursor=cursor, limit=limit, fields=fields, filters={
+        "leave_type": leave_type, "start_from": start_from, "start_to": start_to, "team": team,
+    })
+    if result["success"] and not result["requests"] and cursor is None:
+        result["message"] = "No pending leave requests found."
+    return result
 
 
 def manage_leave_request(manager_id: str, request_id: str, action: str) -> dict:
-    users = read_json_db(USERS_DB_PATH)
+    request_id = normalize_request_id(request_id)
+    store = get_store()
+    with store.transaction():
+        if not _is_manager(manager_id):
+            return {"success": False, "error": "Only managers can approve or reject leave requests."}
 
-    if not _is_manager(manager_id, users):
-        return {"success": False, "error": "Only managers can approve or reject leave requests."}
+        request_to_update = store.get_request(request_id)
 
-    leave_requests = read_json_db(LEAVE_REQUESTS_DB_PATH)
-    request_to_update = next((r for r in leave_requests if r['request_id'] == request_id), None)
+        if not request_to_update:
+            return {"success": False, "error": f"Leave request '{request_id}' not found."}
+        
+        if request_to_update['status'] != 'pending':
+            return {"success": False, "error": f"Request '{request_id}' is already {request_to_update['status']}."}
 
-    if not request_to_update:
-        return {"success": False, "error": f"Leave request '{request_id}' not found."}
-    
-    if request_to_update['status'] != 'pending':
-        return {"success": False, "error": f"Request '{request_id}' is already {request_to_update['status']}."}
+        if action == 'rejected':
+            employee_id = request_to_update['user_id']
+            if not store.get_user(employee_id):
+                return {"success": False, "error": f"Employee '{employee_id}' not found. Action aborted."}
+            store.adjust_balance(employee_id, request_to_update['leave_type'], request_to_update['number_of_days'])
 
-    if action == 'approved':
-        request_to_update['status'] = 'approved'
+        store.set_request_status(request_id, action)
 
-    elif action == 'rejected':
-        request_to_update['status'] = 'rejected'
-        employee_id = request_to_update['user_id']
-        employee_user = next((u for u in users if u['user_id'] == employee_id), None)
- 
-        if employee_user:
-            leave_type = request_to_update['leave_type']
-            employee_user['leave_balances'][leave_type] += request_to_update['number_of_days']
-            write_json_db(USERS_DB_PATH, users)
-        else:
-            request_to_update['status'] = 'pending'
-            return {"success": False, "error": f"Employee '{employee_id}' not found. Action aborted."}
-
-    write_json_db(LEAVE_REQUESTS_DB_PATH, leave_requests)
     return {"success": True, "message": f"Leave request '{request_id}' {action} successfully."}
+
+
+def _matches_filter(store, request: dict, request_filter: dict) -> bool:
+    if request_filter.get('leave_type') and request['leave_type'] != request_filter['leave_type']:
+        return False
+    if request_filter.get('start_from') and request['start_date'] < str(request_filter['start_from']):
+        return False
+    if request_filter.get('start_to') and request['start_date'] > str(request_filter['start_to']):
+        return False
+    if request_filter.get('user_ids') is not None and request['user_id'] not in request_filter['user_ids']:
+        return False
+    if request_filter.get('team'):
+        employee = store.get_user(request['user_id'])
+        if not employee or employee.get('team') != request_filter['team']:
+            return False
+    return True
+
+
+def manage_leave_requests_bulk(manager_id: str, decisions: Optional[list] = None, filter: Optional[dict] = None,
+                               filter_action: Optional[str] = None) -> dict:
+    store = get_store()
+    with store.transaction():
+        if not _is_manager(manager_id):
+            return {"success": False, "error": "Only managers can approve or reject leave requests."}
+
+        decisions = [_as_dict(d) for d in decisions or []]
+        if filter is not None:
+            if filter_action is None:
+                return {"success": False, "error": "A `filter_action` is required when selecting requests by filter."}
+            request_filter = _as_dict(filter)
+            decisions += [
+                {"request_id": r['request_id'], "action": filter_action}
+                for r in store.requests_with_status('pending') if _matches_filter(store, r, request_filter)
+            ]
+
+        if not decisions:
+            return {"success": True, "results": [], "message": "No leave requests matched."}
+
+        # Validate everything first, then apply the valid decisions together in one store write.
+        results = []
+        valid = []
+        seen = set()
+        for decision in decisions:
+            request_id, action = normalize_request_id(decision['request_id']), decision['action']
+            outcome = {"request_id": request_id, "action": action}
+            request = store.get_request(request_id)
+            if request_id in seen:
+                outcome["error"] = f"Leave request '{request_id}' appears more than once."
+            elif not request:
+                outcome["error"] = f"Leave request '{request_id}' not found."
+            elif request['status'] != 'pending':
+                outcome["error"] = f"Request '{request_id}' is already {request['status']}."
+            elif action == 'rejected' and not store.get_user(request['user_id']):
+                outcome["error"] = f"Employee '{request['user_id']}' not found. Action aborted."
+            else:
+                valid.append((request, action))
+            seen.add(request_id)
+            outcome["success"] = "error" not in outcome
+            results.append(outcome)
+
+        for request, action in valid:
+            if action == 'rejected':
+                store.adjust_balance(request['user_id'], request['leave_type'], request['number_of_days'])
+            store.set_request_status(request['request_id'], action)
+
+    return {
+        "success": len(valid) == len(results),
+        "message": f"{len(valid)} of {len(results)} leave requests updated.",
+        "results": results,
+    }
+
+
+def get_team_calendar(user_id: str, start_date: date, end_date: date, team: Optional[str] = None) -> dict:
+
+    if end_date < start_date:
+        return {"success": False, "error": "The end date must not be before the start date."}
+    if (end_date - start_date).days >= MAX_CALENDAR_DAYS:
+        return {"success": False, "error": f"The calendar covers at most {MAX_CALENDAR_DAYS} days at a time."}
+
+    store = get_store()
+    with store.transaction():
+        user = store.get_user(user_id)
+        if not user:
+            return {"success": False, "error": f"User with ID '{user_id}' not found."}
+        only_user = None
+        if user.get('role') != 'manager':
+            team = user.get('team')
+            if team is None:
+                only_user = user_id  # No team to share a calendar with: just their own leave.
+
+        entries = []
+        for req in store.requests_overlapping(start_date.isoformat(), end_date.isoformat(), user_id=only_user, team=team):
+            colleague = store.get_user(req['user_id'])
+            last_day = date.fromisoformat(req['start_date']) + timedelta(days=req['number_of_days'] - 1)
+            entries.append({
+                "request_id": req['request_id'],
+                "user_id": req['user_id'],
+                "name": colleague['name'] if colleague else None,
+                "leave_type": req['leave_type'],
+                "start_date": req['start_date'],
+                "end_date": last_day.isoformat(),
+                "status": req['status'],
+            })
+
+    result = {"success": True, "start_date": start_date.isoformat(), "end_date": end_date.isoformat(),
+              "team": team, "entries": entries}
+    if not entries:
+        result["message"] = "Nobody is on leave in that period."
+    return result
+
+
+def get_requests_created(manager_id: str, since: datetime, until: Optional[datetime] = None,
+                         cursor: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE) -> dict:
+
+    if not _is_manager(manager_id):
+        return {"success": False, "error": "Access denied. Only managers can list requests by creation time."}
+    limit = max(1, min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE))
+    page, next_cursor = get_store().requests_created_between(since, until, cursor, limit)
+    return {"success": True, "requests": page, "next_cursor": next_cursor}
+
+
+# Async tools for the agent and the async endpoints: same logic, run off the event loop.
+aget_leave_balance = to_async(get_leave_balance)
+aapply_for_leave = to_async(apply_for_leave)
+acheck_leave_status = to_async(check_leave_status)
+aget_all_pending_requests = to_async(get_all_pending_requests)
+amanage_leave_request = to_async(manage_leave_request)
+amanage_leave_requests_bulk = to_async(manage_leave_requests_bulk)
+aget_team_calendar = to_async(get_team_calendar)
+aget_requests_created = to_async(get_requests_created)
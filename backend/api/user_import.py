@@ -0,0 +1,249 @@
+"""Bulk import of users and leave balances from an HR feed.
+
+    python -m api.user_import users.csv --dry-run
+    python -m api.user_import users.jsonl --errors-out errors.jsonl
+
+CSV feeds have ``user_id``, ``name``, ``role`` and ``team`` columns; every
+other column is a leave type and holds that balance (leave a cell empty to keep
+the current one). JSONL feeds have one object per line with a
+``leave_balances`` object. The feed is read and validated row by row. Rows for
+existing users update them, and new users need a name. Every valid row is
+written in a single ``upsert_users`` change when the feed ends, and invalid
+rows are listed in the report.
+
+The command line is for operators and may change anyone. Imports through
+``POST /managers/{id}/users/import`` are limited to the employees of that
+manager's team and cannot change roles.
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+from array import array
+from typing import Literal, Optional
+
+from pydantic import BaseModel, ConfigDict, Field, NonNegativeInt, ValidationError
+
+from api.store import StoreLockedError, get_store
+
+CHUNK_SIZE = 10000
+MAX_REPORTED_ERRORS = 1000
+USER_COLUMNS = ("user_id", "name", "role", "team")
+ROW_KEYS = frozenset(USER_COLUMNS + ("leave_balances",))
+ROLES = ('employee', 'manager')
+FORMATS = ("csv", "jsonl")
+
+
+class UserImportRow(BaseModel):
+    model_config = ConfigDict(extra='forbid')
+
+    user_id: str = Field(min_length=1, pattern=r"^\S+$", description="The unique identifier of the user.")
+    name: Optional[str] = Field(default=None, min_length=1, description="Required for new users.")
+    role: Optional[Literal['employee', 'manager']] = Field(default=None, description="Defaults to 'employee' for new users.")
+    team: Optional[str] = Field(default=None, description="Left unchanged when omitted.")
+    leave_balances: dict[str, NonNegativeInt] = Field(default_factory=dict, description="Balances to set, by leave type.")
+
+
+def csv_rows(text):
+    """``(line, row)`` pairs from a CSV file object; ``row`` is an error message for a malformed line."""
+    reader = csv.reader(text)
+    header = next(reader, [])
+    user_columns = [(i, c) for i, c in enumerate(header) if c in USER_COLUMNS]
+    balance_columns = [(i, c) for i, c in enumerate(header) if c not in USER_COLUMNS]
+    width = len(header)
+    for values in reader:
+        if len(values) != width:
+            if values:
+                yield reader.line_num, f"Expected {width} columns, found {len(values)}."
+            continue
+        user = {c: values[i] for i, c in user_columns if values[i]}
+        user['leave_balances'] = {c: values[i] for i, c in balance_columns if values[i]}
+        yield reader.line_num, user
+
+
+def jsonl_rows(text):
+    for line, raw in enumerate(text, 1):
+        if not raw.strip():
+            continue
+        try:
+            row = json.loads(raw)
+        except json.JSONDecodeError as e:
+            yield line, f"Invalid JSON: {e.msg}."
+            continue
+        yield line, row if isinstance(row, dict) else "Each line must be a JSON object."
+
+
+PARSERS = {"csv": csv_rows, "jsonl": jsonl_rows}
+validate_row = UserImportRow.__pydantic_validator__.validate_python  # model_validate minus its per-call overhead
+
+
+def _check_row(raw):
+    """``raw`` itself, balances made ints, if it plainly satisfies ``UserImportRow``; otherwise ``None``.
+
+    Most feed rows are clean, and these checks cost a fraction of a model validation. Anything they
+    do not accept goes through ``UserImportRow``, which has the final say and words the errors.
+    """
+    user_id = raw.get('user_id')
+    if type(user_id) is not str or user_id.split() != [user_id] or not ROW_KEYS.issuperset(raw):
+        return None
+    name, role, team = raw.get('name'), raw.get('role'), raw.get('team')
+    if name is not None and (type(name) is not str or not name) or role is not None and role not in ROLES \
+            or team is not None and type(team) is not str:
+        return None
+    balances = raw.setdefault('leave_balances', {})
+    if type(balances) is not dict:
+        return None
+    for leave_type, balance in balances.items():
+        if type(balance) is str:
+            if not (balance.isascii() and balance.isdigit()):
+                return None
+            balances[leave_type] = int(balance)
+        elif type(balance) is not int or balance < 0:
+            return None
+    return raw
+
+
+def _validate(line, raw):
+    """``(row, None)`` for a valid row as a plain dict, ``(None, error)`` otherwise."""
+    if isinstance(raw, str):
+        return None, {"line": line, "user_id": None, "errors": [raw]}
+    row = _check_row(raw)
+    if row is not None:
+        return row, None
+    try:
+        return validate_row(raw).model_dump(exclude_none=True), None
+    except ValidationError as e:
+        messages = [f"{'.'.join(str(p) for p in err['loc']) or 'row'}: {err['msg']}" for err in e.errors()]
+        return None, {"line": line, "user_id": raw.get('user_id'), "errors": messages}
+
+
+def _scope_errors(row, existing, team):
+    """Why the manager of ``team`` may not import ``row``; empty when they may."""
+    errors = []
+    if existing is not None:
+        if existing[2] != team:
+            errors.append("user_id: not a member of your team")
+        elif existing[1] == 'manager':
+            errors.append("user_id: only an administrator can change a manager")
+    role, row_team = row.get('role'), row.get('team')
+    if role is not None and role != (existing[1] if existing else 'employee'):
+        errors.append("role: only an administrator can change roles")
+    if row_team is not None and row_team != team:
+        errors.append("team: you can only import into your own team")
+    return errors
+
+
+def import_users(rows, dry_run=False, store=None, errors_out=None, manager_id=None):
+    """Validate ``(line, row)`` pairs and upsert the valid ones in one store write; returns the report.
+
+    With ``manager_id`` (imports over HTTP), only employees of that manager's team can be
+    updated or added, and roles cannot change.
+    """
+    store = store or get_store()
+    started = time.perf_counter()
+    report = {"rows": 0, "inserted": 0, "updated": 0, "rejected": 0}
+    errors = []
+    seen = set()
+    lines = array('L')
+    users = []  # Validated rows, then the upsert dicts in their place; rejected rows become None.
+
+    def reject(error):
+        report["rejected"] += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append(error)
+        if errors_out is not None:
+            errors_out.write(json.dumps(error) + '\n')
+
+    def resolve(start, stop, manager_team):
+        profiles = store.user_profiles(users[i]['user_id'] for i in range(start, stop))
+        for i in range(start, stop):
+            row = users[i]
+            users[i] = None
+            user_id = row['user_id']
+            existing = profiles.get(user_id)
+            if manager_id is not None and (scope := _scope_errors(row, existing, manager_team)):
+                reject({"line": lines[i], "user_id": user_id, "errors": scope})
+                continue
+            if existing is None and row.get('name') is None:
+                reject({"line": lines[i], "user_id": user_id, "errors": ["name: required for a new user"]})
+                continue
+            name, role, team = existing or (None, 'employee', manager_team)
+            user = {"user_id": user_id, "name": row.get('name') or name, "role": row.get('role') or role}
+            team = row['team'] if row.get('team') is not None else team
+            if team is not None:
+                user["team"] = team
+            user["leave_balances"] = row['leave_balances']
+            users[i] = user
+            report["updated" if existing else "inserted"] += 1
+
+    # Parsing and validation are most of the work and need no store access, so they run before the
+    # transaction; the store lock is only held for the existence checks and the write.
+    for line, raw in rows:
+        report["rows"] += 1
+        row, error = _validate(line, raw)
+        if error is None and row['user_id'] in seen:
+            error = {"line": line, "user_id": row['user_id'], "errors": ["user_id: appears more than once in the feed"]}
+        if error is not None:
+            reject(error)
+            continue
+        seen.add(row['user_id'])
+        lines.append(line)
+        users.append(row)
+    seen = None
+
+    with store.transaction():
+        manager_team = None
+        if manager_id is not None:
+            manager_team = store.user_profiles([manager_id]).get(manager_id, (None, None, None))[2]
+        for start in range(0, len(users), CHUNK_SIZE):
+            resolve(start, min(start + CHUNK_SIZE, len(users)), manager_team)
+        if report["inserted"] + report["updated"] and not dry_run:
+            store.upsert_users([user for user in users if user is not None])
+
+    return {
+        "success": report["rejected"] == 0,
+        "dry_run": dry_run,
+        **report,
+        "errors": sorted(errors, key=lambda e: e["line"]),
+        "errors_truncated": report["rejected"] > len(errors),
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def import_file(binary, fmt, dry_run=False, store=None, errors_out=None, manager_id=None):
+    """Import from a binary file object holding a UTF-8 ``csv`` or ``jsonl`` feed."""
+    text = io.TextIOWrapper(binary, encoding='utf-8-sig', newline='')
+    try:
+        return import_users(PARSERS[fmt](text), dry_run, store, errors_out, manager_id)
+    finally:
+        text.detach()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=FORMATS, help="Defaults to the file extension.")
+    parser.add_argument("--dry-run", action="store_true", help="Validate and report without writing.")
+    parser.add_argument("--errors-out", help="Write every rejected row here, one JSON line each.")
+    args = parser.parse_args()
+    fmt = args.format or os.path.splitext(args.path)[1].lstrip('.').lower()
+    if fmt not in FORMATS:
+        sys.exit(f"Unknown feed format '{fmt}'; pass --format csv or --format jsonl.")
+
+    errors_out = open(args.errors_out, 'w') if args.errors_out else None
+    try:
+        with open(args.path, 'rb') as f:
+            report = import_file(f, fmt, args.dry_run, errors_out=errors_out)
+    except StoreLockedError as e:
+        sys.exit(str(e))
+    finally:
+        if errors_out is not None:
+            errors_out.close()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
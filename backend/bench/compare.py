@@ -0,0 +1,50 @@
+"""Compare two benchmark result files and flag regressions.
+
+    python -m bench.compare bench/results/base.json bench/results/new.json --threshold 0.1
+
+Exits with status 1 when any shared endpoint or tool got slower at p50, p95 or p99,
+or lost throughput, by more than the threshold (a fraction, default 10%).
+"""
+import argparse
+import json
+import sys
+
+LATENCY_KEYS = ("p50_ms", "p95_ms", "p99_ms")
+
+
+def compare(base: dict, new: dict, threshold: float) -> list:
+    regressions = []
+    for section in ("http", "tools"):
+        for label in sorted(set(base.get(section, {})) & set(new.get(section, {}))):
+            old, cur = base[section][label], new[section][label]
+            for key in LATENCY_KEYS:
+                if old.get(key) and cur.get(key) is not None and cur[key] > old[key] * (1 + threshold):
+                    regressions.append((section, label, key, old[key], cur[key]))
+            if section == "http" and old.get("throughput_rps") and \
+                    cur["throughput_rps"] < old["throughput_rps"] * (1 - threshold):
+                regressions.append((section, label, "throughput_rps", old["throughput_rps"], cur["throughput_rps"]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args()
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+
+    regressions = compare(base, new, args.threshold)
+    for section, label, key, old, cur in regressions:
+        print(f"REGRESSION {section} {label} {key}: {old} -> {cur} ({(cur - old) / old:+.0%})")
+    if not regressions:
+        print(f"No regressions beyond {args.threshold:.0%}.")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""OpenAI-compatible stand-in for the chat model, for load tests without API credits.
+
+    uvicorn bench.fake_llm:app --port 9999
+    OPENROUTER_API_BASE=http://127.0.0.1:9999/v1 uvicorn api.main:app --port 8080
+
+Queries are matched against a fixed script and answered with the same tool call
+every time, after ``FAKE_LLM_LATENCY_MS`` (+/- ``FAKE_LLM_JITTER_MS``) of
+simulated model time. Numbered batch queries get one tool call per line.
+``FAKE_LLM_MODEL_LATENCY_MS=slow-model=800,fast-model=100`` overrides the
+latency per model. A ``FAKE_LLM_SLOW_RATE`` fraction of calls take an extra
+``FAKE_LLM_SLOW_MS``, which gives the latency a tail for hedging runs.
+"""
+import asyncio
+import json
+import os
+import random
+import re
+import time
+from datetime import date, timedelta
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+LATENCY_MS = float(os.environ.get("FAKE_LLM_LATENCY_MS", "200"))
+JITTER_MS = float(os.environ.get("FAKE_LLM_JITTER_MS", "50"))
+MODEL_LATENCY_MS = {
+    model: float(ms) for model, ms in
+    (item.split("=") for item in os.environ.get("FAKE_LLM_MODEL_LATENCY_MS", "").split(",") if item)
+}
+SLOW_RATE = float(os.environ.get("FAKE_LLM_SLOW_RATE", "0"))
+SLOW_MS = float(os.environ.get("FAKE_LLM_SLOW_MS", "2000"))
+FALLBACK_ANSWER = "I can help with leave balances, leave applications and approvals."
+
+app = FastAPI(title="Fake LLM")
+_call_ids = iter(range(1, 1 << 62))
+
+
+def _apply_args(user_id, text):
+    leave_type = re.search(r"(casual|sick|earned)", text)
+    days = re.search(r"(\d+) days?", text)
+    start = re.search(r"(\d{4}-\d{2}-\d{2})", text)
+    return {
+        "user_id": user_id,
+        "leave_type": f"{leave_type.group(1) if leave_type else 'casual'}_leave",
+        "number_of_days": int(days.group(1)) if days else 1,
+        "start_date": start.group(1) if start else (date.today() + timedelta(days=30)).isoformat(),
+        "reason": "load test",
+    }
+
+
+def _manage_args(user_id, text):
+    m = re.search(r"(req_[0-9a-z]+)", text)
+    action = "rejected" if "reject" in text else "approved"
+    return {"manager_id": user_id, "request_id": m.group(1) if m else "req_missing", "action": action}
+
+
+# First matching pattern wins, so the more specific intents come first.
+SCRIPT = [
+    (re.compile(r"\b(approve|reject)\b.*req_"), "manage_leave_request", _manage_args),
+    (re.compile(r"pending|approval"), "get_all_pending_requests", lambda u, t: {"manager_id": u}),
+    (re.compile(r"\b(apply|book|take)\b"), "apply_for_leave", _apply_args),
+    (re.compile(r"history|status|requests"), "check_leave_status", lambda u, t: {"user_id": u}),
+    (re.compile(r"balance|left|how many|remaining"), "get_leave_balance", lambda u, t: {"user_id": u}),
+]
+
+
+def script_tool_call(user_id: str, query: str):
+    text = query.lower()
+    for pattern, tool, make_args in SCRIPT:
+        if pattern.search(text):
+            return tool, make_args(user_id, text)
+    return None
+
+
+def _plan(messages):
+    """Tool calls (name, args) for the conversation, or ``None`` for a plain text answer."""
+    if messages[-1]["role"] == "tool":
+        return None
+    human = next(m["content"] for m in reversed(messages) if m["role"] == "user")
+    user_id = re.search(r"User ID: (\S+)", human).group(1)
+    query = human.split("Query:", 1)[-1].strip()
+    numbered = re.findall(r"^\d+\. (.+)$", query, re.MULTILINE)
+    calls = [script_tool_call(user_id, q) for q in (numbered or [query])]
+    if not all(calls):
+        return None
+    return calls
+
+
+def _message(calls):
+    if calls is None:
+        return {"role": "assistant", "content": FALLBACK_ANSWER}
+    return {"role": "assistant", "content": None, "tool_calls": [
+        {"id": f"call_{next(_call_ids)}", "type": "function",
+         "function": {"name": name, "arguments": json.dumps(args)}}
+        for name, args in calls
+    ]}
+
+
+def _usage(body, message):
+    prompt_chars = len(json.dumps(body.get("messages", []))) + len(json.dumps(body.get("tools", [])))
+    completion_tokens = len(json.dumps(message)) // 4
+    return {"prompt_tokens": prompt_chars // 4, "completion_tokens": completion_tokens,
+            "total_tokens": prompt_chars // 4 + completion_tokens}
+
+
+def _stream(base, message, finish_reason, usage):
+    delta = dict(message)
+    if "tool_calls" in delta:
+        delta["tool_calls"] = [{"index": i, **call} for i, call in enumerate(delta["tool_calls"])]
+    yield "data: " + json.dumps({**base, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}) + "\n\n"
+    yield "data: " + json.dumps({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": finish_reason}],
+                                 "usage": usage}) + "\n\n"
+    yield "data: [DONE]\n\n"
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    latency_ms = MODEL_LATENCY_MS.get(body.get("model"), LATENCY_MS) + random.uniform(-JITTER_MS, JITTER_MS)
+    if random.random() < SLOW_RATE:
+        latency_ms += SLOW_MS
+    await asyncio.sleep(max(0.0, latency_ms) / 1000)
+
+    calls = _plan(body["messages"])
+    message = _message(calls)
+    finish_reason = "stop" if calls is None else "tool_calls"
+    usage = _usage(body, message)
+    base = {"id": f"chatcmpl-{next(_call_ids)}", "created": int(time.time()), "model": body.get("model", "fake")}
+
+    if body.get("stream"):
+        return StreamingResponse(_stream({**base, "object": "chat.completion.chunk"}, message, finish_reason, usage),
+                                 media_type="text/event-stream")
+    return {**base, "object": "chat.completion", "usage": usage,
+            "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}]}
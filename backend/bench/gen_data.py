@@ -0,0 +1,93 @@
+"""Generate a synthetic users.json / leave_requests.json data set.
+
+    python -m bench.gen_data --size 100k
+
+writes ``bench/data/100k/``. Point the app at it with ``LEAVE_DATA_DIR``. The
+output is deterministic for a given size and seed, so runs on different
+machines or commits load the same data.
+"""
+import argparse
+import json
+import os
+import random
+from datetime import date, timedelta
+
+BENCH_DIR = os.path.dirname(__file__)
+SIZES = {"1k": 1_000, "100k": 100_000, "1M": 1_000_000}
+LEAVE_TYPES = ["casual_leave", "sick_leave", "earned_leave"]
+REASONS = ["family function", "high fever", "travel", "doctor's appointment", "moving house", "personal work"]
+NAMES = ["Alice", "Bob", "Charlie", "Diana", "Ethan", "Fiona", "George", "Hannah", "Ivan", "Julia"]
+TEAM_SIZE = 10
+
+
+def user_id(i: int) -> str:
+    return f"user{i:07d}"
+
+
+def make_users(n_users: int, rng: random.Random) -> list:
+    # The first user of every team is its manager.
+    return [{
+        "user_id": user_id(i),
+        "name": f"{NAMES[i % len(NAMES)]} {i}",
+        "role": "manager" if i % TEAM_SIZE == 0 else "employee",
+        "team": f"team{i // TEAM_SIZE:05d}",
+        "leave_balances": {
+            "casual_leave": rng.randint(0, 12),
+            "sick_leave": rng.randint(0, 10),
+            "earned_leave": rng.randint(0, 20),
+        },
+    } for i in range(n_users)]
+
+
+def iter_requests(n_requests: int, n_users: int, rng: random.Random):
+    first_day = date(2025, 1, 1)
+    for i in range(n_requests):
+        # The "s" keeps synthetic IDs apart from the time-ordered IDs apply_for_leave mints (see api.request_ids).
+        yield {
+            "request_id": f"req_s{i:07d}",
+            "user_id": user_id(rng.randrange(n_users)),
+            "leave_type": rng.choice(LEAVE_TYPES),
+            "start_date": (first_day + timedelta(days=rng.randrange(730))).isoformat(),
+            "number_of_days": rng.randint(1, 5),
+            "reason": rng.choice(REASONS),
+            "status": rng.choices(["pending", "approved", "rejected"], weights=[2, 6, 2])[0],
+        }
+
+
+def _write_json_array(path, records):
+    # One record per line instead of json.dump: the 1M set is never held as one string.
+    with open(path, 'w') as f:
+        f.write("[\n")
+        for i, record in enumerate(records):
+            if i:
+                f.write(",\n")
+            f.write(json.dumps(record))
+        f.write("\n]\n")
+
+
+def generate(out_dir: str, n_requests: int, n_users: int = None, seed: int = 42):
+    n_users = n_users or max(TEAM_SIZE, n_requests // 10)
+    rng = random.Random(seed)
+    os.makedirs(out_dir, exist_ok=True)
+    _write_json_array(os.path.join(out_dir, 'users.json'), make_users(n_users, rng))
+    _write_json_array(os.path.join(out_dir, 'leave_requests.json'), iter_requests(n_requests, n_users, rng))
+    print(f"Wrote {n_users} users and {n_requests} leave requests to {out_dir}")
+    return out_dir
+
+
+def dataset_dir(size: str) -> str:
+    return os.path.join(BENCH_DIR, 'data', size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", choices=SIZES, default="1k", help="Number of leave requests.")
+    parser.add_argument("--users", type=int, help="Number of users (default: a tenth of the requests).")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", help="Output directory (default: bench/data/<size>).")
+    args = parser.parse_args()
+    generate(args.out or dataset_dir(args.size), SIZES[args.size], args.users, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""Async load driver and tool micro-benchmark.
+
+``run_load`` replays employee and manager sessions against a running API:
+each virtual user logs in, then sends a few agent queries drawn from its
+role's mix. The mix has dashboard templates, which take the fast path, and
+free-text questions, which go to the model. ``run_tool_bench`` calls the tool
+functions in-process against the same data set. Both return latency
+summaries keyed by endpoint and by tool.
+"""
+import asyncio
+import json
+import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+import httpx
+
+# (weight, tool, query template, writes data)
+EMPLOYEE_MIX = [
+    (20, "get_leave_balance", "Show my leave balance", False),
+    (15, "get_leave_balance", "How many leave days do I have left?", False),
+    (20, "check_leave_status", "Show my leave history", False),
+    (15, "check_leave_status", "What is the status of my recent leave requests?", False),
+    (5, "apply_for_leave", "Apply for casual leave for 1 day, starting on {start}. The reason is: load test", True),
+    (5, "apply_for_leave", "Can I take {days} days of sick leave from {start}?", True),
+]
+MANAGER_MIX = [
+    (25, "get_all_pending_requests", "Show pending leave requests", False),
+    (20, "get_all_pending_requests", "Who is waiting for my approval?", False),
+    (15, "manage_leave_request", "Approve request {request_id}", True),
+    (5, "manage_leave_request", "Please reject {request_id}", True),
+    (10, "get_leave_balance", "Show my leave balance", False),
+]
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    i = min(len(sorted_values) - 1, max(0, round(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[i]
+
+
+def summarize(latencies, errors, elapsed):
+    values = sorted(latencies)
+    ms = lambda v: None if v is None else round(v * 1000, 2)
+    return {
+        "count": len(values),
+        "errors": errors,
+        "throughput_rps": round(len(values) / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": ms(sum(values) / len(values)) if values else None,
+        "p50_ms": ms(percentile(values, 50)),
+        "p95_ms": ms(percentile(values, 95)),
+        "p99_ms": ms(percentile(values, 99)),
+        "max_ms": ms(values[-1]) if values else None,
+    }
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self.windows = {}  # label -> (first start, last end), for calls recorded with ``started``
+        self._lock = threading.Lock()
+
+    def record(self, label, seconds, ok=True, started=None):
+        with self._lock:
+            self.latencies.setdefault(label, []).append(seconds)
+            if not ok:
+                self.errors[label] = self.errors.get(label, 0) + 1
+            if started is not None:
+                first, last = self.windows.get(label, (started, started))
+                self.windows[label] = (min(first, started), max(last, started + seconds))
+
+    def summary(self, elapsed):
+        # Throughput is over each label's own window when there is one, else over the whole run.
+        return {label: summarize(values, self.errors.get(label, 0),
+                                 self.windows[label][1] - self.windows[label][0] if label in self.windows else elapsed)
+                for label, values in sorted(self.latencies.items())}
+
+
+def load_population(data_dir, max_pending=10_000, seed=0):
+    """Employee IDs, manager IDs and a sample of pending request IDs from a data set."""
+    with open(os.path.join(data_dir, 'users.json')) as f:
+        users = json.load(f)
+    employees = [u['user_id'] for u in users if u.get('role', 'employee') != 'manager']
+    managers = [u['user_id'] for u in users if u.get('role') == 'manager']
+
+    # Scan line by line so the 1M request file is never parsed whole; files written
+    # with json.dump(indent=2) put the status on its own line, so track the last ID seen.
+    pending, request_id, seen = [], None, 0
+    rng = random.Random(seed)
+    with open(os.path.join(data_dir, 'leave_requests.json')) as f:
+        for line in f:
+            m = re.search(r'"request_id": "([^"]+)"', line)
+            if m:
+                request_id = m.group(1)
+            if '"status": "pending"' in line and request_id:
+                seen += 1
+                if len(pending) < max_pending:
+                    pending.append(request_id)
+                elif rng.randrange(seen) < max_pending:
+                    pending[rng.randrange(max_pending)] = request_id
+    return employees, managers, pending
+
+
+def _pick(mix, rng, read_only):
+    mix = [m for m in mix if not (read_only and m[3])]
+    return rng.choices(mix, weights=[m[0] for m in mix])[0]
+
+
+def _fill(template, rng, pending):
+    start = date.today() + timedelta(days=rng.randint(7, 90))
+    return template.format(start=start.isoformat(), days=rng.randint(1, 3),
+                           request_id=pending.pop() if pending else "req_missing")
+
+
+async def _session(client, rng, recorder, population, manager_ratio, queries_per_session, read_only):
+    employees, managers, pending = population
+    is_manager = managers and rng.random() < manager_ratio
+    user_id = rng.choice(managers if is_manager else employees)
+
+    t = time.perf_counter()
+    try:
+        ok = (await client.post("/login", json={"user_id": user_id})).status_code == 200
+    except httpx.HTTPError:
+        ok = False
+    recorder.record("POST /login", time.perf_counter() - t, ok)
+
+    for _ in range(queries_per_session):
+        _, tool, template, _ = _pick(MANAGER_MIX if is_manager else EMPLOYEE_MIX, rng, read_only)
+        query = _fill(template, rng, pending)
+        t = time.perf_counter()
+        path = "error"
+        try:
+            response = await client.post("/agent/invoke", json={"user_id": user_id, "query": query})
+            ok = response.status_code == 200
+            path = response.headers.get("X-Agent-Path", "unknown")
+        except httpx.HTTPError:
+            ok = False
+        elapsed = time.perf_counter() - t
+        recorder.record("POST /agent/invoke", elapsed, ok)
+        recorder.record(f"tool:{tool}", elapsed, ok)
+        recorder.record(f"path:{path}", elapsed, ok)
+
+
+async def run_load(base_url, data_dir, duration=30.0, concurrency=32, manager_ratio=0.1,
+                   queries_per_session=4, read_only=False, seed=1, timeout=60.0):
+    population = load_population(data_dir, seed=seed)
+    recorder = Recorder()
+    deadline = time.perf_counter() + duration
+
+    async def virtual_user(i):
+        rng = random.Random(seed * 1000 + i)
+        while time.perf_counter() < deadline:
+            await _session(client, rng, recorder, population, manager_ratio, queries_per_session, read_only)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(virtual_user(i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return recorder.summary(elapsed)
+
+
+def run_tool_bench(data_dir, iterations=200, workers=8, read_only=False, seed=2):
+    """Call each tool function directly, bypassing HTTP and the agent."""
+    os.environ["LEAVE_DATA_DIR"] = data_dir
+    from api import tools
+
+    employees, managers, pending = load_population(data_dir, seed=seed)
+    rng = random.Random(seed)
+    start = date.today() + timedelta(days=30)
+    calls = {
+        "get_leave_balance": lambda: tools.get_leave_balance(rng.choice(employees)),
+        "check_leave_status": lambda: tools.check_leave_status(rng.choice(employees)),
+        "get_all_pending_requests": lambda: tools.get_all_pending_requests(rng.choice(managers)),
+    }
+    if not read_only:
+        calls["apply_for_leave"] = lambda: tools.apply_for_leave(
+            rng.choice(employees), "casual_leave", start, 1, "load test")
+        calls["manage_leave_request"] = lambda: tools.manage_leave_request(
+            rng.choice(managers), pending.pop() if pending else "req_missing", "approved")
+
+    # The first call loads the data set; keep it out of the per-call numbers.
+    t = time.perf_counter()
+    tools.get_leave_balance(employees[0])
+    load_seconds = time.perf_counter() - t
+
+    recorder = Recorder()
+
+    def timed(name):
+        t = time.perf_counter()
+        try:
+            # A refused request ({"success": False}) is a valid answer, not a benchmark error.
+            ok = isinstance(calls[name](), dict)
+        except Exception:
+            ok = False
+        recorder.record(f"tool:{name}", time.perf_counter() - t, ok, started=t)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(timed, [name for name in calls for _ in range(iterations)]))
+    summary = recorder.summary(time.perf_counter() - started)
+    summary["store_load"] = summarize([load_seconds], 0, load_seconds)
+    return summary
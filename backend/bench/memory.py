@@ -0,0 +1,103 @@
+"""Resident memory of the leave store's request records.
+
+    python -m bench.memory --size 1M
+
+Loads ``leave_requests.json`` from a data set (see ``bench.gen_data``) once per
+layout, each in a fresh interpreter, and reports how much resident memory it
+added once loaded, plus the peak while loading:
+
+- ``dicts``: one dict per request, indexed by ID, as the store used to hold them;
+- ``table``: the same requests in a ``RequestTable`` (see ``api.records``);
+- ``store``: a whole ``LeaveStore`` (users, table and every index).
+
+RSS comes from ``/proc/self/status``, so the numbers are Linux-only.
+"""
+import argparse
+import gc
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+from bench.gen_data import SIZES, dataset_dir, generate
+
+LAYOUTS = ("dicts", "table", "store")
+
+
+def _rss_mb():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    raise RuntimeError("VmRSS not found in /proc/self/status.")
+
+
+def _peak_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(layout, data_dir):
+    """Load ``data_dir`` as ``layout`` in this process and return its memory figures."""
+    from api.records import RequestTable
+    from api.store import LeaveStore, iter_json_db, read_json_db
+
+    requests_path = os.path.join(data_dir, 'leave_requests.json')
+    gc.collect()
+    base = _rss_mb()
+    started = time.perf_counter()
+    if layout == "dicts":
+        held = {r['request_id']: r for r in read_json_db(requests_path)}
+        count = len(held)
+    elif layout == "table":
+        held = RequestTable(iter_json_db(requests_path))
+        count = len(held)
+    else:
+        held = LeaveStore(os.path.join(data_dir, 'users.json'), requests_path)
+        with held.transaction():
+            count = len(held._requests)
+    seconds = time.perf_counter() - started
+    gc.collect()
+    rss = _rss_mb() - base
+    return {
+        "layout": layout,
+        "requests": count,
+        "load_s": round(seconds, 2),
+        "rss_mb": round(rss, 1),
+        "peak_mb": round(_peak_mb() - base, 1),
+        "bytes_per_request": round(rss * 2 ** 20 / count) if count else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", choices=SIZES, default="1M", help="Number of leave requests.")
+    parser.add_argument("--layout", choices=LAYOUTS, action="append", help="Measure only these (repeatable).")
+    parser.add_argument("--out", help="Also write the results here as JSON.")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    source = dataset_dir(args.size)
+    if args.child:
+        print(json.dumps(measure(args.layout[0], source)))
+        return
+    if not os.path.exists(os.path.join(source, 'leave_requests.json')):
+        generate(source, SIZES[args.size])
+
+    results = []
+    for layout in args.layout or LAYOUTS:
+        # A fresh interpreter per layout, so one's freed memory never flatters the next.
+        out = subprocess.run([sys.executable, "-m", "bench.memory", "--child", "--size", args.size, "--layout", layout],
+                             check=True, capture_output=True, text=True).stdout
+        result = json.loads(out.splitlines()[-1])
+        results.append(result)
+        print(f"{layout:6} requests={result['requests']:<8} rss={result['rss_mb']}MB "
+              f"peak={result['peak_mb']}MB per_request={result['bytes_per_request']}B load={result['load_s']}s")
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
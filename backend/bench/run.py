@@ -0,0 +1,144 @@
+"""Run the offline benchmark end to end and save the results as JSON.
+
+    python -m bench.run --size 100k --duration 30 --concurrency 32
+
+Generates the data set if needed and copies it to a scratch directory, since
+the run writes to it. Starts ``bench.fake_llm`` and ``api.main`` under uvicorn
+against that copy, drives load through HTTP, then times the tool functions
+in-process. Results go to ``bench/results/<size>-<timestamp>.json``; compare
+two runs with ``python -m bench.compare``.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+from bench.gen_data import BENCH_DIR, SIZES, dataset_dir, generate
+from bench.load import run_load, run_tool_bench
+
+BACKEND_DIR = os.path.abspath(os.path.join(BENCH_DIR, '..'))
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start_server(app, port, env, log_path):
+    log = open(log_path, 'w')
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", app, "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    deadline = time.time() + 600  # Loading the 1M set can take a while.
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"{app} exited during startup, see {log_path}")
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/docs", timeout=1.0)
+            return proc
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError(f"{app} did not start within 10 minutes, see {log_path}")
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", choices=SIZES, default="1k")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of HTTP load.")
+    parser.add_argument("--concurrency", type=int, default=32, help="Concurrent virtual users.")
+    parser.add_argument("--manager-ratio", type=float, default=0.1)
+    parser.add_argument("--queries-per-session", type=int, default=4)
+    parser.add_argument("--llm-latency-ms", type=float, default=200.0)
+    parser.add_argument("--llm-jitter-ms", type=float, default=50.0)
+    parser.add_argument("--tool-iterations", type=int, default=200, help="Calls per tool in the in-process bench.")
+    parser.add_argument("--store-backend", default=os.environ.get("LEAVE_STORE_BACKEND", "json"))
+    parser.add_argument("--read-only", action="store_true", help="Leave out applications and approvals.")
+    parser.add_argument("--skip-http", action="store_true", help="Only run the in-process tool bench.")
+    parser.add_argument("--out", help="Result file (default: bench/results/<size>-<timestamp>.json).")
+    args = parser.parse_args()
+
+    source = dataset_dir(args.size)
+    if not os.path.exists(os.path.join(source, 'leave_requests.json')):
+        generate(source, SIZES[args.size])
+
+    started_at = datetime.now(timezone.utc)
+    results = {
+        "meta": {
+            **vars(args),
+            "started_at": started_at.isoformat(),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+    }
+
+    with tempfile.TemporaryDirectory(prefix="leave-bench-") as scratch:
+        http_data = os.path.join(scratch, 'http')
+        shutil.copytree(source, http_data)
+
+        if not args.skip_http:
+            llm_port, api_port = _free_port(), _free_port()
+            env = {
+                **os.environ,
+                "FAKE_LLM_LATENCY_MS": str(args.llm_latency_ms),
+                "FAKE_LLM_JITTER_MS": str(args.llm_jitter_ms),
+                "OPENROUTER_API_BASE": f"http://127.0.0.1:{llm_port}/v1",
+                "OPENROUTER_API_KEY": "fake",
+                "OPENROUTER_MODEL": "fake",
+                "LEAVE_DATA_DIR": http_data,
+                "LEAVE_STORE_BACKEND": args.store_backend,
+            }
+            servers = [_start_server("bench.fake_llm:app", llm_port, env, os.path.join(scratch, 'fake_llm.log'))]
+            try:
+                servers.append(_start_server("api.main:app", api_port, env, os.path.join(scratch, 'api.log')))
+                print(f"Driving {args.concurrency} virtual users for {args.duration}s against the {args.size} data set...")
+                results["http"] = asyncio.run(run_load(
+                    f"http://127.0.0.1:{api_port}", http_data, args.duration, args.concurrency,
+                    args.manager_ratio, args.queries_per_session, args.read_only,
+                ))
+            finally:
+                for proc in servers:
+                    proc.terminate()
+                    proc.wait()
+
+        tool_data = os.path.join(scratch, 'tools')
+        shutil.copytree(source, tool_data)
+        os.environ["LEAVE_STORE_BACKEND"] = args.store_backend
+        print(f"Timing {args.tool_iterations} calls per tool in-process...")
+        results["tools"] = run_tool_bench(tool_data, args.tool_iterations, read_only=args.read_only)
+
+    out = args.out or os.path.join(BENCH_DIR, 'results', f"{args.size}-{started_at:%Y%m%dT%H%M%SZ}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    for section in ("http", "tools"):
+        for label, s in results.get(section, {}).items():
+            print(f"{section:5} {label:40} n={s['count']:<6} err={s['errors']:<4} "
+                  f"rps={s['throughput_rps']:<8} p50={s['p50_ms']}ms p95={s['p95_ms']}ms p99={s['p99_ms']}ms")
+    print(f"Results written to {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,20 +6,116 @@ import './App.css';
 const API_URL = 'http://localhost:8080';
 
 
-const invokeAgent = async (userId, userRole, query) => {
+// Streams /agent/stream and calls onEvent(event, data) as each SSE event arrives.
+const streamAgent = async (userId, userRole, query, onEvent) => {
+  const response = await fetch(`${API_URL}/agent/stream`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ user_id: userId, role: userRole, query }),
+  });
+  if (!response.ok) throw new Error('An agent error occurred. Please try again.');
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    const frames = buffer.split('\n\n');
+    buffer = frames.pop();
+    for (const frame of frames) {
+      const event = frame.match(/^event: (.*)$/m)?.[1];
+      const data = frame.match(/^data: (.*)$/m)?.[1];
+      if (event && data) onEvent(event, JSON.parse(data));
+    }
+  }
+};
+
+// Dashboard reads and actions already know which tool they need, so they call
+// the direct endpoints instead of going through the agent.
+const callApi = async (method, path, body) => {
   try {
-    const response = await axios.post(`${API_URL}/agent/invoke`, {
-      user_id: userId,
-      role: userRole, 
-      query: query,
-    });
+    const response = await axios({ method, url: `${API_URL}${path}`, data: body });
     return response.data;
   } catch (error) {
-    console.error(`Error invoking agent for query "${query}":`, error);
-    throw error.response?.data?.detail || 'An agent error occurred. Please try again.';
+    console.error(`Error calling ${method.toUpperCase()} ${path}:`, error);
+    throw error.response?.data?.detail || 'A server error occurred. Please try again.';
   }
 };
 
+const api = {
+  getLeaveBalance: (userId) => callApi('get', `/users/${userId}/leave-balance`),
+  getLeaveHistory: (userId, cursor, includeArchived) => {
+    const params = new URLSearchParams();
+    if (cursor) params.set('cursor', cursor);
+    if (includeArchived) params.set('include_archived', 'true');
+    const query = params.toString();
+    return callApi('get', `/users/${userId}/leave-requests${query ? `?${query}` : ''}`);
+  },
+  getPendingRequests: (managerId, cursor) =>
+    callApi('get', `/managers/${managerId}/pending-requests${cursor ? `?cursor=${encodeURIComponent(cursor)}` : ''}`),
+  applyForLeave: (leave) => callApi('post', '/leave-requests', leave),
+  decideLeaveRequest: (requestId, managerId, action) =>
+    callApi('post', `/leave-requests/${requestId}/decision`, { manager_id: managerId, action }),
+};
+
+
+const AssistantChat = ({ user, onAction }) => {
+  const [query, setQuery] = useState('');
+  const [messages, setMessages] = useState([]);
+  const [isSending, setIsSending] = useState(false);
+
+  const updateLast = (text, isError = false) =>
+    setMessages(prev => [...prev.slice(0, -1), { from: 'agent', text, isError }]);
+
+  const handleSend = async (e) => {
+    e.preventDefault();
+    if (!query.trim()) return;
+    const text = query;
+    setQuery('');
+    setIsSending(true);
+    setMessages(prev => [...prev, { from: 'user', text }, { from: 'agent', text: 'Thinking...' }]);
+    try {
+      await streamAgent(user.id, user.role, text, (event, data) => {
+        if (event === 'tool_start') {
+          updateLast(`Running ${data.tool.replace(/_/g, ' ')}...`);
+        } else if (event === 'final') {
+          const reply = typeof data.output === 'string' ? data.output : JSON.stringify(data.output, null, 2);
+          updateLast(reply);
+        } else if (event === 'error') {
+          updateLast(data.detail, true);
+        }
+      });
+      if (onAction) await onAction();
+    } catch (error) {
+      updateLast(`${error.message || error}`, true);
+    } finally {
+      setIsSending(false);
+    }
+  };
+
+  return (
+    <div className="card full-width-card">
+      <h3>Ask the Assistant</h3>
+      <div className="chat-log">
+        {messages.map((m, i) => (
+          <pre key={i} className={`chat-message ${m.from}${m.isError ? ' error' : ''}`}>{m.text}</pre>
+        ))}
+      </div>
+      <form onSubmit={handleSend} className="chat-form">
+        <input
+          type="text"
+          value={query}
+          onChange={e => setQuery(e.target.value)}
+          placeholder="e.g., Apply for 2 days of sick leave starting tomorrow"
+        />
+        <button type="submit" disabled={isSending}>{isSending ? '...' : 'Send'}</button>
+      </form>
+    </div>
+  );
+};
+
 
 const Login = ({ onLoginSuccess }) => {
   const [userId, setUserId] = useState('');
@@ -66,6 +162,10 @@ const Login = ({ onLoginSuccess }) => {
 const EmployeeDashboard = ({ user, onLogout }) => {
     const [balances, setBalances] = useState(null);
     const [history, setHistory] = useState([]);
+    const [historyCursor, setHistoryCursor] = useState(null);
+    // Past years' decided requests are archived and only listed on request.
+    const [includeArchived, setIncludeArchived] = useState(false);
+    const [archivedYears, setArchivedYears] = useState([]);
     const [loading, setLoading] = useState(true);
     const [leaveType, setLeaveType] = useState('casual_leave');
     const [numberOfDays, setNumberOfDays] = useState(1);
@@ -78,18 +178,30 @@ const EmployeeDashboard = ({ user, onLogout }) => {
         setLoading(true);
         try {
             const [balanceResult, historyResult] = await Promise.all([
-                invokeAgent(user.id, user.role, "Get my current leave balance."),
-                invokeAgent(user.id, user.role, "Get my entire leave history.")
+                api.getLeaveBalance(user.id),
+                api.getLeaveHistory(user.id, null, includeArchived)
             ]);
             if (balanceResult?.balances) setBalances(balanceResult.balances);
             if (Array.isArray(historyResult?.requests)) setHistory(historyResult.requests);
+            setHistoryCursor(historyResult?.next_cursor || null);
+            setArchivedYears(historyResult?.archived_years || []);
         } catch (error) {
             console.error("Failed to fetch dashboard data:", error);
             setFormMessage({ type: 'error', text: 'Could not load dashboard data. Please refresh.' });
         } finally {
             setLoading(false);
         }
-    }, [user.id, user.role]);
+    }, [user.id, includeArchived]);
+
+    const loadMoreHistory = async () => {
+        try {
+            const result = await api.getLeaveHistory(user.id, historyCursor, includeArchived);
+            if (Array.isArray(result?.requests)) setHistory(prev => [...prev, ...result.requests]);
+            setHistoryCursor(result?.next_cursor || null);
+        } catch (error) {
+            setFormMessage({ type: 'error', text: `${error}` });
+        }
+    };
 
     useEffect(() => {
         fetchDashboardData();
@@ -99,9 +211,14 @@ const EmployeeDashboard = ({ user, onLogout }) => {
         e.preventDefault();
         setIsSubmitting(true);
         setFormMessage({ type: '', text: '' });
-        const query = `Apply for ${leaveType.replace('_', ' ')} for ${numberOfDays} days, starting on ${startDate}. The reason is: ${reason}`;
         try {
-            const result = await invokeAgent(user.id, user.role, query);
+            const result = await api.applyForLeave({
+                user_id: user.id,
+                leave_type: leaveType,
+                start_date: startDate,
+                number_of_days: Number(numberOfDays),
+                reason,
+            });
             if (result.success) {
                 setFormMessage({ type: 'success', text: result.message || 'Leave applied successfully!' });
                 setLeaveType('casual_leave');
@@ -186,7 +303,17 @@ const EmployeeDashboard = ({ user, onLogout }) => {
                             </tbody>
                         </table>
                     </div>
+                    {!loading && historyCursor && (
+                        <button className="load-more" onClick={loadMoreHistory}>Load more</button>
+                    )}
+                    {!loading && archivedYears.length > 0 && (
+                        <button className="load-more" onClick={() => setIncludeArchived(true)}>
+                            Show older history ({archivedYears.join(', ')})
+                        </button>
+                    )}
                 </div>
+
+                <AssistantChat user={user} onAction={fetchDashboardData} />
             </main>
         </div>
     );
@@ -195,6 +322,7 @@ const EmployeeDashboard = ({ user, onLogout }) => {
 
 const ManagerDashboard = ({ user, onLogout }) => {
     const [pendingRequests, setPendingRequests] = useState([]);
+    const [pendingCursor, setPendingCursor] = useState(null);
     const [loading, setLoading] = useState(true);
     const [message, setMessage] = useState({ type: '', text: '' });
     const [isProcessing, setIsProcessing] = useState(null); // Track which request is being processed
@@ -203,7 +331,8 @@ const ManagerDashboard = ({ user, onLogout }) => {
         setLoading(true);
         setMessage({ type: '', text: '' });
         try {
-            const result = await invokeAgent(user.id, user.role, "Show me all pending leave requests.");
+            const result = await api.getPendingRequests(user.id);
+            setPendingCursor(result.next_cursor || null);
             if (result.success && Array.isArray(result.requests)) {
                 setPendingRequests(result.requests);
             } else {
@@ -216,18 +345,27 @@ const ManagerDashboard = ({ user, onLogout }) => {
         } finally {
             setLoading(false);
         }
-    }, [user.id, user.role]);
+    }, [user.id]);
 
     useEffect(() => {
         fetchPendingRequests();
     }, [fetchPendingRequests]);
 
+    const loadMorePending = async () => {
+        try {
+            const result = await api.getPendingRequests(user.id, pendingCursor);
+            if (Array.isArray(result?.requests)) setPendingRequests(prev => [...prev, ...result.requests]);
+            setPendingCursor(result?.next_cursor || null);
+        } catch (error) {
+            setMessage({ type: 'error', text: `${error}` });
+        }
+    };
+
     const handleManageRequest = async (requestId, action) => {
         setIsProcessing(requestId);
         setMessage({ type: '', text: '' });
-        const query = `${action === 'approved' ? 'Approve' : 'Reject'} leave request ${requestId}`;
         try {
-            const result = await invokeAgent(user.id, user.role, query);
+            const result = await api.decideLeaveRequest(requestId, user.id, action);
             if (result.success) {
                 setMessage({ type: 'success', text: result.message });
                 // Refresh the list after a successful action
@@ -291,7 +429,12 @@ const ManagerDashboard = ({ user, onLogout }) => {
                             </tbody>
                         </table>
                     </div>
+                    {!loading && pendingCursor && (
+                        <button className="load-more" onClick={loadMorePending}>Load more</button>
+                    )}
                 </div>
+
+                <AssistantChat user={user} onAction={fetchPendingRequests} />
             </main>
         </div>
     );